@@ -0,0 +1,481 @@
+# ================================
+# Email Assistant Agent Loop
+# ================================
+"""
+An agent loop around the email_tools functions that runs the tool calls
+of one model turn concurrently.
+
+aisuite's built-in loop (max_turns) executes the tool calls the model
+returns one after another, so a turn that asks for five emails waits for
+five round trips. run_agent() calls the model itself and hands each
+turn's tool calls to a thread pool instead:
+
+    result = run_agent(build_prompt("Summarize my unread emails"), model="anthropic:claude-sonnet-4-20250514")
+    print(result["content"])
+
+Calls are independent unless they touch the same email and at least one
+of them changes it; those keep the order the model gave them (for
+example mark_email_as_read(3) then get_email(3)). Bulk tools selecting
+by filter may touch any email, so they are ordered against every call
+that names an email ID. Everything else starts at once, so a turn's wall
+time approaches that of its slowest call.
+
+Parallel calls only help when the provider returns them. With the pinned
+aisuite==0.1.11, the Anthropic provider keeps only the first tool_use
+block of a response, so with "anthropic:" models every turn carries a
+single call and runs exactly as before; providers that pass through
+OpenAI-style parallel tool_calls get the concurrency. The speedup has so
+far only been measured with a scripted client (batch_runner.StubClient).
+
+Every call's start, end and duration (relative to the turn) is returned
+in the result's "turns", next to the turn's wall time and the time the
+same calls would have taken one after another. Pass a Tracer to also get
+exact LLM turns and per-tool HTTP time, bytes and tokens.
+
+Each run gets its own tool_cache.ToolCache, so a read the model repeats
+with the same arguments is answered without another service request
+until a mutating call invalidates it. Tool results are compacted
+(compaction.Compactor) before they go back to the model, so each turn
+adds at most AGENT_TOKEN_BUDGET tokens of tool output to the context.
+
+Configuration is read from the environment:
+
+    AGENT_MAX_WORKERS    Tool calls run at once within a turn (default 8)
+    AGENT_TOOL_CACHE     Memoize read-only tools within a run (default true)
+    AGENT_COMPACTION     Compact tool results to the token budget (default true)
+"""
+
+import os
+import json
+import time
+import inspect
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import email_tools
+from compaction import Compactor
+from tool_cache import ToolCache
+
+MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "8"))
+TOOL_CACHE = os.getenv("AGENT_TOOL_CACHE", "true").lower() in ("1", "true", "yes")
+COMPACTION = os.getenv("AGENT_COMPACTION", "true").lower() in ("1", "true", "yes")
+
+DEFAULT_TOOLS = [
+    email_tools.list_all_emails,
+    email_tools.list_unread_emails,
+    email_tools.search_emails,
+    email_tools.filter_emails,
+    email_tools.search_unread_from_sender,
+    email_tools.get_changes,
+    email_tools.get_email,
+    email_tools.mark_email_as_read,
+    email_tools.mark_email_as_unread,
+    email_tools.send_email,
+    email_tools.delete_email,
+    email_tools.mark_emails_as_read,
+    email_tools.mark_emails_as_unread,
+    email_tools.delete_emails,
+]
+
+# Tools that change the mailbox; calls to them are never reordered
+# against other calls on the same email
+MUTATING_TOOLS = {
+    "mark_email_as_read",
+    "mark_email_as_unread",
+    "delete_email",
+    "send_email",
+    "mark_emails_as_read",
+    "mark_emails_as_unread",
+    "delete_emails",
+}
+
+# Marks a call that may touch any email
+ANY_EMAIL = "*"
+
+# Bulk tools select by ID list and/or filter; any filter argument widens
+# the call to ANY_EMAIL
+BULK_TOOLS = {"mark_emails_as_read", "mark_emails_as_unread", "delete_emails"}
+BULK_FILTERS = ("sender", "recipient", "start_date", "end_date", "read")
+
+
+# ================================
+# Tool Schemas
+# ================================
+
+_JSON_TYPES = {int: "integer", float: "number", str: "string", bool: "boolean", dict: "object"}
+
+
+def _json_type(annotation) -> dict:
+    """JSON schema for a parameter annotation (Optional[X] is treated as X)."""
+    origin = typing.get_origin(annotation)
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if origin is typing.Union and len(args) == 1:
+        return _json_type(args[0])
+    if origin in (list, List):
+        return {"type": "array", "items": _json_type(args[0]) if args else {}}
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    return {"type": "string"}
+
+
+def _parse_docstring(doc: str) -> tuple:
+    """
+    Split a Google-style docstring into (description, {param: description}).
+
+    Uses docstring_parser when it is installed, otherwise reads the
+    "Args:" section directly.
+    """
+    try:
+        from docstring_parser import parse
+    except ImportError:
+        parse = None
+    if parse is not None:
+        parsed = parse(doc)
+        description = " ".join(part for part in (parsed.short_description, parsed.long_description) if part)
+        return description, {param.arg_name: param.description or "" for param in parsed.params}
+
+    description, params, section, current = [], {}, None, None
+    for line in doc.splitlines():
+        stripped = line.strip()
+        if stripped.endswith(":") and stripped[:-1] in ("Args", "Returns", "Raises"):
+            section = stripped[:-1]
+        elif section is None:
+            if stripped:
+                description.append(stripped)
+        elif section == "Args" and stripped:
+            name, sep, text = stripped.partition(":")
+            if sep and name.isidentifier():
+                current = name
+                params[current] = text.strip()
+            elif current:
+                params[current] += " " + stripped
+    return " ".join(description), params
+
+
+def tool_schema(tool: Callable) -> dict:
+    """
+    OpenAI-style function schema for a tool, from its signature and docstring.
+
+    Parameters without a default are required.
+    """
+    description, param_docs = _parse_docstring(inspect.getdoc(tool) or "")
+    hints = typing.get_type_hints(tool)
+    properties, required = {}, []
+    for name, param in inspect.signature(tool).parameters.items():
+        prop = _json_type(hints.get(name, str))
+        if param_docs.get(name):
+            prop["description"] = param_docs[name]
+        properties[name] = prop
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+    return {
+        "type": "function",
+        "function": {
+            "name": tool.__name__,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+# ================================
+# Scheduling
+# ================================
+
+def _call_keys(name: str, args) -> set:
+    """The emails a call touches: email IDs, ANY_EMAIL, or none (list and search tools)."""
+    keys = set()
+    if not isinstance(args, dict):
+        return keys
+    if isinstance(args.get("email_id"), (int, str)):
+        keys.add(args["email_id"])
+    if isinstance(args.get("email_ids"), list):
+        keys.update(email_id for email_id in args["email_ids"] if isinstance(email_id, (int, str)))
+    if name in BULK_TOOLS and any(args.get(field) is not None for field in BULK_FILTERS):
+        keys.add(ANY_EMAIL)
+    return keys
+
+
+def _conflicts(a: tuple, b: tuple) -> bool:
+    (name_a, keys_a), (name_b, keys_b) = a, b
+    if name_a not in MUTATING_TOOLS and name_b not in MUTATING_TOOLS:
+        return False
+    if not keys_a or not keys_b:
+        return False
+    return ANY_EMAIL in keys_a or ANY_EMAIL in keys_b or bool(keys_a & keys_b)
+
+
+def schedule(calls: List[tuple]) -> List[List[int]]:
+    """
+    Group one turn's tool calls into chains that can run concurrently.
+
+    Args:
+        calls: (tool name, arguments dict) pairs in the order the model gave them.
+
+    Returns:
+        Lists of call indices. Calls in the same chain conflict (directly
+        or through another call) and must run in the listed order; the
+        chains themselves are independent.
+    """
+    parent = list(range(len(calls)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    described = [(name, _call_keys(name, args)) for name, args in calls]
+    for later in range(len(calls)):
+        for earlier in range(later):
+            if _conflicts(described[earlier], described[later]):
+                parent[find(later)] = find(earlier)
+
+    chains = {}
+    for index in range(len(calls)):
+        chains.setdefault(find(index), []).append(index)
+    return list(chains.values())
+
+
+# ================================
+# Tool Execution
+# ================================
+
+class InvalidArguments(ValueError):
+    """The model sent tool arguments that are not a JSON object."""
+
+
+def _run_call(registry: dict, name: str, args, turn_started: float) -> dict:
+    """Run one tool call; errors (including InvalidArguments) are returned to the model rather than raised."""
+    record = {
+        "tool": name,
+        "args": args if isinstance(args, dict) else None,
+        "start_ms": round((time.perf_counter() - turn_started) * 1000, 3),
+    }
+    started = time.perf_counter()
+    try:
+        if isinstance(args, InvalidArguments):
+            raise args
+        if name not in registry:
+            raise KeyError(f"unknown tool {name!r}")
+        result = registry[name](**args)
+    except Exception as exc:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+        result = {"error": record["error"]}
+    record["wall_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    record["end_ms"] = round((time.perf_counter() - turn_started) * 1000, 3)
+    record["result"] = result
+    return record
+
+
+def execute_tool_calls(calls: List[tuple], registry: dict, max_workers: int = MAX_WORKERS) -> dict:
+    """
+    Run one turn's tool calls, concurrently where schedule() allows.
+
+    Args:
+        calls: (tool name, arguments dict) pairs in the order the model gave them.
+        registry: Tool functions by name.
+        max_workers: Calls run at once.
+
+    Returns:
+        {"calls": [...], "wall_ms": ..., "serial_ms": ...}. "calls" is in the
+        model's order, each with its timing, result and any error;
+        serial_ms is what running them one after another would have taken.
+    """
+    records = [None] * len(calls)
+    turn_started = time.perf_counter()
+
+    def run_chain(chain):
+        for index in chain:
+            name, args = calls[index]
+            records[index] = _run_call(registry, name, args, turn_started)
+
+    chains = schedule(calls)
+    if len(chains) <= 1 or max_workers <= 1:
+        for chain in chains:
+            run_chain(chain)
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chains))) as pool:
+            list(pool.map(run_chain, chains))
+
+    return {
+        "calls": records,
+        "wall_ms": round((time.perf_counter() - turn_started) * 1000, 3),
+        "serial_ms": round(sum(record["wall_ms"] for record in records), 3),
+    }
+
+
+# ================================
+# Agent Loop
+# ================================
+
+def _field(obj, name, default=None):
+    """Read `name` from a provider response object or a plain dict."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _parse_tool_call(tool_call) -> tuple:
+    """
+    (tool name, arguments dict) for one tool call.
+
+    Arguments that are not a JSON object come back as an InvalidArguments
+    instance, which the call then reports to the model as its error.
+    """
+    function = _field(tool_call, "function")
+    arguments = _field(function, "arguments") or {}
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments) if arguments.strip() else {}
+        except ValueError as exc:
+            return _field(function, "name"), InvalidArguments(f"arguments are not valid JSON: {exc}")
+    if not isinstance(arguments, dict):
+        return _field(function, "name"), InvalidArguments("arguments must be a JSON object")
+    return _field(function, "name"), arguments
+
+
+def _assistant_message(message) -> dict:
+    """The model's message as a plain dict to send back on the next turn."""
+    tool_calls = []
+    for tool_call in _field(message, "tool_calls") or []:
+        function = _field(tool_call, "function")
+        arguments = _field(function, "arguments")
+        tool_calls.append({
+            "id": _field(tool_call, "id"),
+            "type": "function",
+            "function": {
+                "name": _field(function, "name"),
+                "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments),
+            },
+        })
+    entry = {"role": "assistant", "content": _field(message, "content") or ""}
+    if tool_calls:
+        entry["tool_calls"] = tool_calls
+    return entry
+
+
+def _usage(response) -> dict:
+    usage = _field(response, "usage")
+    if usage is None:
+        return {}
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    if isinstance(usage, dict):
+        return dict(usage)
+    return {key: value for key, value in vars(usage).items() if not key.startswith("_")}
+
+
+def _check_deadline(deadline: Optional[float]) -> None:
+    if deadline is not None and time.monotonic() >= deadline:
+        raise TimeoutError("agent run exceeded its deadline")
+
+
+def run_agent(
+    prompt: str,
+    model: str,
+    tools: Optional[List[Callable]] = None,
+    max_turns: int = 5,
+    max_workers: int = MAX_WORKERS,
+    tracer=None,
+    client=None,
+    cache: bool = TOOL_CACHE,
+    compaction: bool = COMPACTION,
+    deadline: Optional[float] = None,
+) -> dict:
+    """
+    Run the model with the email tools until it answers without calling any.
+
+    Args:
+        prompt: The user message (usually from main.build_prompt()).
+        model: "provider:model" name, as for aisuite.
+        tools: Tool functions to offer; defaults to DEFAULT_TOOLS.
+        max_turns: Maximum number of model calls.
+        max_workers: Tool calls run at once within a turn.
+        tracer: Optional tracer.Tracer; tools are wrapped, each model
+            call is recorded with llm_turn() and each result is counted
+            as sent, after compaction, with record_sent().
+        client: Chat client with chat.completions.create(); defaults to
+            main.get_client().
+        cache: Memoize the read-only tools for this run.
+        compaction: Compact tool results to the per-turn token budget.
+        deadline: time.monotonic() value after which the run stops with
+            TimeoutError. Checked before each model call and each turn's
+            tool calls; a call already in progress is not interrupted.
+
+    Returns:
+        {"content": final answer, "messages": [...], "turns": [...],
+        "cache": ToolCache.stats() or None, "compaction":
+        Compactor.stats() or None}. Each turn has llm_ms, the tool calls
+        it issued with their timing, the turn's tool wall_ms and
+        serial_ms, and the tokens of tool output before and after
+        compaction.
+    """
+    if client is None:
+        from main import get_client
+        client = get_client()
+    tools = list(tools or DEFAULT_TOOLS)
+    tool_cache = ToolCache() if cache else None
+    if tool_cache is not None:
+        tools = tool_cache.wrap_all(tools)
+    compactor = Compactor() if compaction else None
+    if tracer is not None:
+        tracer.cache = tool_cache
+        tracer.compaction = compactor
+        tools = tracer.wrap_all(tools)
+    registry = {tool.__name__: tool for tool in tools}
+    schemas = [tool_schema(tool) for tool in tools]
+
+    messages = [{"role": "user", "content": prompt}]
+    turns = []
+    content = None
+    for _ in range(max_turns):
+        _check_deadline(deadline)
+        started = time.perf_counter()
+        if tracer is not None:
+            with tracer.llm_turn() as llm_turn:
+                response = client.chat.completions.create(model=model, messages=messages, tools=schemas)
+                llm_turn["usage"].update(_usage(response))
+        else:
+            response = client.chat.completions.create(model=model, messages=messages, tools=schemas)
+        turn = {"turn": len(turns) + 1, "llm_ms": round((time.perf_counter() - started) * 1000, 3),
+                "usage": _usage(response)}
+        turns.append(turn)
+
+        message = _field(_field(response, "choices")[0], "message")
+        content = _field(message, "content")
+        tool_calls = _field(message, "tool_calls") or []
+        messages.append(_assistant_message(message))
+        if not tool_calls:
+            break
+
+        _check_deadline(deadline)
+        executed = execute_tool_calls([_parse_tool_call(call) for call in tool_calls], registry, max_workers)
+        turn.update(executed)
+        results = [record.pop("result") for record in executed["calls"]]
+        if compactor is not None:
+            before = compactor.stats()
+            contents = compactor.compact_turn(results)
+            after = compactor.stats()
+            turn["tokens_before"] = after["tokens_before"] - before["tokens_before"]
+            turn["tokens_after"] = after["tokens_after"] - before["tokens_after"]
+        else:
+            contents = [json.dumps(result, default=str) for result in results]
+        for tool_call, record, tool_content in zip(tool_calls, executed["calls"], contents):
+            if tracer is not None:
+                tracer.record_sent(record["tool"], tool_content)
+            messages.append({
+                "role": "tool",
+                "tool_call_id": _field(tool_call, "id"),
+                "name": record["tool"],
+                "content": tool_content,
+            })
+
+    return {
+        "content": content,
+        "messages": messages,
+        "turns": turns,
+        "cache": tool_cache.stats() if tool_cache is not None else None,
+        "compaction": compactor.stats() if compactor is not None else None,
+    }
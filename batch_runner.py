@@ -0,0 +1,392 @@
+# ================================
+# Batch Agent Runner
+# ================================
+"""
+Push a JSONL file of user requests through the email agent.
+
+Each input line is a JSON object with an ID and a prompt (by default the
+"request_id" and "prompt" fields; the line number is used when the ID is
+missing). Every request is wrapped with main.build_prompt() and run with
+agent.run_agent(), --concurrency at a time:
+
+    python batch_runner.py requests.jsonl --out answers.jsonl --model anthropic:claude-sonnet-4-20250514
+    python batch_runner.py requests.jsonl --prompt-field title body --concurrency 16
+    python batch_runner.py requests.jsonl --model stub --stub-latency 0.2 --stub-rate-limit 0.1
+
+One JSON line is appended to --out as each request finishes:
+
+    {"id", "status": "ok" | "error" | "timeout", "content", "error",
+     "elapsed_ms", "rate_limit_retries", "turns", "trace"}
+
+"trace" is the request's tracer.Tracer trace: per-tool timing, HTTP time,
+bytes and tokens, LLM turns and tool cache statistics.
+
+The output file is also the checkpoint. Lines are flushed and fsynced as
+they are written, so after a crash the same command resumes where the
+batch stopped: requests whose last line is "ok" are skipped, and failed or
+timed-out ones are run again (unless --no-retry-failed). A line cut short
+by the crash is ignored.
+
+Model calls that fail with a rate limit (HTTP 429) are retried with
+exponential backoff and jitter, or after the provider's Retry-After, up
+to --retries times. Other errors fail the request. --timeout bounds each
+request; it is checked between model calls and tool calls, so a single
+model call is bounded by the provider client's own timeout.
+
+--model stub runs against StubClient, a scripted client that needs no API
+key and can inject latency and rate limits, to exercise the runner and
+the email service end to end.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from agent import MAX_WORKERS, run_agent
+from main import build_prompt
+from tracer import Tracer
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+# ================================
+# Input & Checkpoint
+# ================================
+
+def load_requests(path: str, id_field: str = "request_id", prompt_fields: tuple = ("prompt",)) -> List[tuple]:
+    """
+    Read (id, prompt) pairs from a JSONL file.
+
+    Args:
+        path: JSONL file, one request object per line.
+        id_field: Field holding the request ID; the line number is used when it is missing.
+        prompt_fields: Fields joined (blank-line separated) into the prompt.
+
+    Returns:
+        (id, prompt) pairs in file order. Requests without a prompt have
+        prompt None and are reported as errors.
+    """
+    requests = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            request_id = str(record.get(id_field, line_number))
+            if request_id in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate request ID {request_id!r}")
+            seen.add(request_id)
+            parts = [str(record[field]) for field in prompt_fields if record.get(field)]
+            requests.append((request_id, "\n\n".join(parts) or None))
+    return requests
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    Last recorded status per request ID in an output file ({} if it does not exist).
+
+    Lines that are not valid JSON (a write cut short by a crash) are skipped.
+    """
+    statuses = {}
+    if not os.path.exists(path):
+        return statuses
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            statuses[record["id"]] = record["status"]
+    return statuses
+
+
+def _truncate_partial_line(path: str) -> None:
+    """Drop a trailing line without a newline so the next append starts on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+# ================================
+# Rate Limit Retries
+# ================================
+
+def is_rate_limited(exc: Exception) -> bool:
+    """True for provider rate-limit errors (HTTP 429), whichever SDK raised them."""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    if getattr(getattr(exc, "response", None), "status_code", None) == 429:
+        return True
+    return "RateLimit" in type(exc).__name__
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from a Retry-After header, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryingClient:
+    """
+    Wraps a chat client so rate-limited model calls are retried with backoff.
+
+    One instance per request: it stops retrying when the request's
+    deadline would pass, and counts the retries it made.
+    """
+
+    def __init__(self, client, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 deadline: Optional[float] = None):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.rate_limit_retries = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except Exception as exc:
+                if not is_rate_limited(exc) or attempt == self.retries:
+                    raise
+                delay = retry_after(exc)
+                if delay is None:
+                    delay = min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+                if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+                    raise
+                self.rate_limit_retries += 1
+                time.sleep(delay)
+
+
+# ================================
+# Stub Client
+# ================================
+
+class StubRateLimitError(Exception):
+    status_code = 429
+
+
+class StubClient:
+    """
+    Scripted stand-in for the aisuite client, for running batches without a provider.
+
+    Each run lists the unread emails, opens the first one, and answers
+    with its subject. `latency` seconds are spent per model call, and a
+    `rate_limit_rate` fraction of calls fail with a 429.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def _tool_call(self, name: str, arguments: dict):
+        with self._lock:
+            self.calls += 1
+            call_id = f"stub_{self.calls}"
+        return SimpleNamespace(id=call_id, type="function",
+                               function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+    def create(self, model: str, messages: list, tools: list = None, **kwargs):
+        with self._lock:
+            rate_limited = self._random.random() < self.rate_limit_rate
+        time.sleep(self.latency)
+        if rate_limited:
+            raise StubRateLimitError("stub rate limit")
+
+        last = messages[-1]
+        tool_calls, content = None, None
+        if last["role"] == "user":
+            tool_calls = [self._tool_call("list_unread_emails", {"limit": 5})]
+        elif last.get("name") == "list_unread_emails" and json.loads(last["content"]).get("emails"):
+            first = json.loads(last["content"])["emails"][0]
+            tool_calls = [self._tool_call("get_email", {"email_id": first["id"]})]
+        elif last.get("name") == "get_email":
+            content = f"Your latest unread email is \"{json.loads(last['content']).get('subject')}\"."
+        else:
+            content = "You have no unread emails."
+        message = SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+# ================================
+# Runner
+# ================================
+
+def run_one(request_id: str, prompt: Optional[str], model: str, client, timeout: float,
+            retries: int, backoff: float, max_turns: int, max_workers: int) -> dict:
+    """Run one request through the agent and return its output record."""
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout if timeout else None
+    retrying = RetryingClient(client, retries, backoff, deadline)
+    tracer = Tracer()
+    record = {"id": request_id, "status": "ok", "content": None, "error": None}
+    try:
+        if prompt is None:
+            raise ValueError("request has no prompt")
+        with tracer.run():
+            result = run_agent(build_prompt(prompt), model, max_turns=max_turns, max_workers=max_workers,
+                               tracer=tracer, client=retrying, deadline=deadline)
+        record["content"] = result["content"]
+    except TimeoutError as exc:
+        record.update(status="timeout", error=str(exc))
+    except Exception as exc:
+        record.update(status="error", error=f"{type(exc).__name__}: {exc}")
+    trace = tracer.trace()
+    record.update(
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 3),
+        rate_limit_retries=retrying.rate_limit_retries,
+        turns=trace["totals"]["turns"],
+        trace=trace,
+    )
+    return record
+
+
+def run_batch(
+    requests: List[tuple],
+    out_path: str,
+    model: str,
+    client=None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    max_turns: int = 5,
+    max_workers: int = MAX_WORKERS,
+    resume: bool = True,
+    retry_failed: bool = True,
+    progress=None,
+) -> dict:
+    """
+    Run `requests` through the agent and append one output record per request to `out_path`.
+
+    Args:
+        requests: (id, prompt) pairs, e.g. from load_requests().
+        out_path: Output JSONL file, also used as the checkpoint.
+        model: "provider:model" name.
+        client: Chat client; defaults to main.get_client().
+        concurrency: Requests in flight at once.
+        timeout: Seconds per request (0 for none).
+        retries: Retries of a rate-limited model call.
+        backoff: Initial backoff in seconds, doubled on each retry.
+        max_turns: Maximum model calls per request.
+        max_workers: Concurrent tool calls within one turn.
+        resume: Skip requests already completed in `out_path`; False truncates it.
+        retry_failed: When resuming, run failed and timed-out requests again.
+        progress: Optional callback(done, total, seconds_so_far).
+
+    Returns:
+        Counts by status, requests skipped as already done, and requests/sec.
+    """
+    if client is None:
+        from main import get_client
+        client = get_client()
+
+    if resume:
+        _truncate_partial_line(out_path)
+        statuses = load_checkpoint(out_path)
+    else:
+        open(out_path, "w").close()
+        statuses = {}
+    finished = {"ok"} if retry_failed else {"ok", "error", "timeout"}
+    pending = [(request_id, prompt) for request_id, prompt in requests if statuses.get(request_id) not in finished]
+
+    counts = {"ok": 0, "error": 0, "timeout": 0}
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(run_one, request_id, prompt, model, client, timeout, retries, backoff, max_turns, max_workers)
+            for request_id, prompt in pending
+        ]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                with write_lock:
+                    out.write(json.dumps(record, default=str) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                counts[record["status"]] += 1
+                if progress:
+                    progress(done, len(pending), time.perf_counter() - started)
+        except KeyboardInterrupt:
+            # Stop without starting the queued requests; rerun to resume
+            for future in futures:
+                future.cancel()
+            raise
+
+    seconds = time.perf_counter() - started
+    return {
+        **counts,
+        "skipped": len(requests) - len(pending),
+        "seconds": round(seconds, 3),
+        "requests_per_sec": round(len(pending) / seconds, 2) if seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Input JSONL file")
+    parser.add_argument("--out", help="Output JSONL file and checkpoint (default <input>.out.jsonl)")
+    parser.add_argument("--model", default="anthropic:claude-sonnet-4-20250514", help='"provider:model", or "stub"')
+    parser.add_argument("--id-field", default="request_id")
+    parser.add_argument("--prompt-field", nargs="+", default=["prompt"], help="Fields joined into the prompt")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds per request (0 for none)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries of a rate-limited model call")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help="Initial backoff in seconds")
+    parser.add_argument("--max-turns", type=int, default=5)
+    parser.add_argument("--restart", action="store_true", help="Ignore and overwrite an existing output file")
+    parser.add_argument("--no-retry-failed", action="store_true", help="On resume, skip failed requests too")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds per model call with --model stub")
+    parser.add_argument("--stub-rate-limit", type=float, default=0.0, help="Fraction of 429s with --model stub")
+    args = parser.parse_args()
+
+    out_path = args.out or os.path.splitext(args.path)[0] + ".out.jsonl"
+    client = StubClient(args.stub_latency, args.stub_rate_limit) if args.model == "stub" else None
+
+    def progress(done, total, seconds):
+        if done == total or done % 10 == 0:
+            print(f"{done}/{total} requests, {done / seconds:.2f} requests/sec", file=sys.stderr)
+
+    result = run_batch(
+        load_requests(args.path, args.id_field, tuple(args.prompt_field)),
+        out_path,
+        args.model,
+        client=client,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        retries=args.retries,
+        backoff=args.backoff,
+        max_turns=args.max_turns,
+        resume=not args.restart,
+        retry_failed=not args.no_retry_failed,
+        progress=progress,
+    )
+    print(json.dumps(dict(result, out=out_path), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# ================================
+# Benchmarks
+# ================================
+"""
+Benchmark scripts for the email service. Run them from the repo root, e.g.
+
+    python -m benchmarks.bench_async
+    python -m benchmarks.suite --emails 100000
+
+benchmarks.suite drives every endpoint and tool against a synthetic
+mailbox from benchmarks.mailbox and writes JSON results that
+benchmarks.compare can diff across commits. benchmarks.import_time
+fails when importing the agent and tool modules slows down.
+"""
@@ -0,0 +1,130 @@
+# ================================
+# Benchmark: Sync vs Async Service
+# ================================
+"""
+Compare email_service (sync handlers, threadpool) with email_service_async
+(async handlers, AsyncSession) under concurrent load.
+
+Each app is started in its own uvicorn process, then hammered with a
+read-heavy mix of requests from many concurrent clients. Prints
+throughput and latency percentiles for both modes.
+
+Unless DATABASE_URL is set, each app gets a fresh SQLite database in a
+temporary directory (seeded on startup), so both start from the same
+mailbox and ./emails.db is never touched.
+
+    python -m benchmarks.bench_async --concurrency 64 --requests 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+APPS = {
+    "sync": "email_service:app",
+    "async": "email_service_async:app",
+}
+
+# (weight, method, path, params)
+REQUEST_MIX = [
+    (4, "GET", "/emails", {"limit": 20}),
+    (4, "GET", "/emails/unread", {"limit": 20}),
+    (2, "GET", "/emails/search", {"q": "report"}),
+    (2, "GET", "/emails/filter", {"sender": "boss@email.com", "read": "false"}),
+    (4, "GET", "/emails/2", None),
+    (1, "PATCH", "/emails/1/read", None),
+]
+
+
+def start_server(target: str, port: int, env: dict = None) -> subprocess.Popen:
+    """Start uvicorn for `target` (with extra environment `env`) and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=dict(os.environ, **(env or {})),
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/emails", params={"limit": 1})
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{target} did not start on port {port}")
+
+
+async def drive(base_url: str, concurrency: int, total: int) -> dict:
+    """Send `total` requests from `concurrency` workers; return latency stats."""
+    weights = [weight for weight, *_ in REQUEST_MIX]
+    plan = random.Random(0).choices(REQUEST_MIX, weights=weights, k=total)
+    queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                _, method, path, params = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.request(method, path, params=params)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--modes", nargs="+", default=list(APPS), choices=list(APPS))
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            env = {} if "DATABASE_URL" in os.environ else {"DATABASE_URL": f"sqlite:///{os.path.join(tmp, mode)}.db"}
+            process = start_server(APPS[mode], args.port, env)
+            try:
+                base_url = f"http://127.0.0.1:{args.port}"
+                asyncio.run(drive(base_url, args.concurrency, min(200, args.requests)))  # warm-up
+                results[mode] = asyncio.run(drive(base_url, args.concurrency, args.requests))
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
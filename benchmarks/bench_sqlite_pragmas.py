@@ -0,0 +1,143 @@
+# ================================
+# Benchmark: SQLite Connection Profiles
+# ================================
+"""
+Mixed read/write throughput with and without the tuned SQLite profile.
+
+For each profile in models.SQLITE_PROFILES a fresh database file is
+created with the service's full schema (models.init_schema: indexes
+plus the FTS5 and change log triggers, so every write pays the same
+per-row trigger cost as in the service) and seeded. Reader threads then
+page through /emails/unread-style queries while writer threads insert
+emails and flip read flags, each write in its own commit, for a fixed
+duration. Prints operations per second for each profile.
+
+    python -m benchmarks.bench_sqlite_pragmas --rows 20000 --readers 8 --writers 2
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+# models opens DATABASE_URL as soon as it is imported; keep that off disk
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from models import Email, SQLITE_PROFILES, use_sqlite_pragmas, init_schema
+
+
+def make_engine(path: str, pragmas: dict):
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=32,
+    )
+    use_sqlite_pragmas(engine, pragmas)
+    init_schema(engine)
+    return engine
+
+
+def seed(engine, rows: int) -> None:
+    start = datetime.utcnow() - timedelta(days=365)
+    batch = [
+        {
+            "sender": f"user{i % 500}@example.com",
+            "recipient": "you@email.com",
+            "subject": f"Subject {i}",
+            "body": f"Body of email {i} " * 10,
+            "timestamp": start + timedelta(seconds=i * 30),
+            "read": i % 3 == 0,
+        }
+        for i in range(rows)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Email), batch)
+
+
+def run_mix(engine, readers: int, writers: int, seconds: float, max_id: int) -> dict:
+    """Run reader and writer threads against `engine` for `seconds`."""
+    Session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        statement = (
+            select(Email).where(Email.read == False)
+            .order_by(Email.timestamp.desc(), Email.id.desc()).limit(50)
+        )
+        while not stop.is_set():
+            with Session() as db:
+                try:
+                    db.execute(statement).all()
+                    bump("reads")
+                except OperationalError:
+                    bump("errors")
+
+    def writer(seed_value):
+        rng = random.Random(seed_value)
+        while not stop.is_set():
+            with Session() as db:
+                try:
+                    if rng.random() < 0.5:
+                        db.add(Email(sender="bench@example.com", recipient="you@email.com",
+                                     subject="bench", body="bench", read=False))
+                    else:
+                        db.execute(update(Email).where(Email.id == rng.randint(1, max_id))
+                                   .values(read=rng.random() < 0.5))
+                    db.commit()
+                    bump("writes")
+                except OperationalError:
+                    db.rollback()
+                    bump("errors")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "reads_per_sec": round(counts["reads"] / seconds, 1),
+        "writes_per_sec": round(counts["writes"] / seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            engine = make_engine(os.path.join(tmp, f"{profile}.db"), SQLITE_PROFILES[profile])
+            seed(engine, args.rows)
+            results[profile] = run_mix(engine, args.readers, args.writers, args.seconds, args.rows)
+            engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# ================================
+# Benchmark: Compare Runs
+# ================================
+"""
+Compare two benchmarks.suite result files, scenario by scenario.
+
+Prints p50/p95/p99 latency and throughput for both runs and the relative
+change; latency increases and throughput drops beyond --threshold percent
+are flagged, and the exit status is 1 if any scenario regressed.
+
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+
+import argparse
+import json
+import sys
+
+METRICS = [("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("throughput_rps", True)]
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """
+    Rows of (scenario, metric, before, after, change %, regressed) for every
+    scenario present in both runs.
+    """
+    rows = []
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            delta = change(old[metric], new[metric])
+            regressed = -delta > threshold if higher_is_better else delta > threshold
+            rows.append((name, metric, old[metric], new[metric], delta, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"\n  {before['meta']['commit']} -> {after['meta']['commit']}\n")
+    print(f"  {'Scenario':<32} {'Metric':<15} {'Before':>10} {'After':>10} {'Change':>9}")
+    print("-" * 82)
+    rows = compare(before, after, args.threshold)
+    for name, metric, old, new, delta, regressed in rows:
+        flag = "  <-- regression" if regressed else ""
+        print(f"  {name:<32} {metric:<15} {old:>10} {new:>10} {delta:>+8.1f}%{flag}")
+    print()
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
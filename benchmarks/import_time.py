@@ -0,0 +1,98 @@
+# ================================
+# Benchmark: Import-Time Budget
+# ================================
+"""
+Fail when importing the agent and tool modules gets slow again.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+(best of --repeat runs). The check fails if its cumulative import time
+exceeds its budget, or if it pulls in a module that should only be loaded
+on first use (aisuite and its provider SDKs, dotenv, requests, the
+database stack). The module check is machine-independent; scale the time
+budgets for slow machines with --scale.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --scale 2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget per module, in milliseconds
+BUDGETS_MS = {
+    "main": 25,
+    "email_tools": 25,
+    "utils": 25,
+    "service_client": 20,
+    "display_functions": 15,
+    "tracer": 25,
+    "agent": 50,
+    "tool_cache": 15,
+    "batch_runner": 60,
+    "compaction": 30,
+}
+
+# Modules that must not be loaded as a side effect of the import
+DEFERRED = ["aisuite", "openai", "anthropic", "mistralai", "vertexai", "dotenv", "requests", "sqlalchemy", "fastapi"]
+
+
+def measure(module: str) -> tuple:
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        (cumulative import time in ms, set of modules loaded).
+    """
+    code = f"import sys, json; import {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; the module itself is not
+        if name.rstrip() == f" {module}":
+            cumulative_us = int(cumulative.strip())
+    return cumulative_us / 1000, set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def check(modules: list, repeat: int, scale: float) -> list:
+    """Measure each module; return (module, ms, budget ms, unexpected imports, ok) rows."""
+    rows = []
+    for module in modules:
+        runs = [measure(module) for _ in range(repeat)]
+        best = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        unexpected = sorted(name for name in DEFERRED if name in loaded)
+        budget = BUDGETS_MS[module] * scale
+        rows.append((module, best, budget, unexpected, best <= budget and not unexpected))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(BUDGETS_MS), choices=list(BUDGETS_MS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every time budget")
+    args = parser.parse_args()
+
+    rows = check(args.modules, args.repeat, args.scale)
+    print(f"\n  {'Module':<20} {'Import ms':>10} {'Budget ms':>10}  Unexpected imports")
+    print("-" * 70)
+    for module, ms, budget, unexpected, ok in rows:
+        flag = "" if ok else "  <-- FAIL"
+        print(f"  {module:<20} {ms:>10.1f} {budget:>10.1f}  {', '.join(unexpected) or '-'}{flag}")
+    print()
+    sys.exit(0 if all(row[-1] for row in rows) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# ================================
+# Benchmark: Endpoint and Tool Suite
+# ================================
+"""
+Reproducible latency/throughput benchmark for every email_service endpoint
+and every email_tools function.
+
+A synthetic mailbox of --emails rows is generated once (see
+benchmarks.mailbox) and copied for each run, so writes made by one run
+never leak into the next. Each scenario then runs --requests operations
+from --concurrency threads, with parameters (IDs, search words, senders,
+date windows) drawn from a seeded RNG, through either a local uvicorn
+server or the in-process ASGI transport. The export scenario streams the
+whole mailbox once and reports rows/sec; in-process, the body is
+buffered before it is read, so that figure is not a streaming one.
+
+Deletes take their IDs from a shared, shuffled pool of IDs no earlier
+delete has used, so every delete removes a row (DELETE_BATCH per bulk
+delete). Scenarios run in the order given, except that the deleting
+scenarios run after all others and the export, and reset_database runs
+last: it replaces the synthetic mailbox with the six initial emails, so
+only its first (warmup) call resets the full mailbox and the timed calls
+measure a reset of the small one.
+
+Results (p50/p95/p99/mean latency, throughput, errors, plus the commit,
+machine and arguments) are printed and written to benchmarks/results/
+as JSON; compare two runs with benchmarks.compare.
+
+    python -m benchmarks.suite --emails 100000 --concurrency 16 --requests 2000
+    python -m benchmarks.suite --emails 10000 --transport inprocess --scenarios list search tool:get_email
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from benchmarks.mailbox import DATA_DIR, KNOWN_SENDERS, COMMON_WORDS, ensure_mailbox
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MAILBOX_START = datetime(2024, 1, 1)
+
+
+# ================================
+# Scenarios
+# ================================
+# Each scenario maps (rng, context) to one operation. Endpoint operations
+# return an HTTP response; tool operations return the tool's result.
+
+def _request(method: str, path: str, **kwargs):
+    import service_client
+    return lambda: service_client.request(method, path, **kwargs)
+
+
+def _window(rng, context):
+    start = MAILBOX_START + timedelta(days=rng.uniform(0, 720))
+    return start.isoformat(), (start + timedelta(days=7)).isoformat()
+
+
+def _walk_pages(pages: int, **params):
+    import service_client
+
+    def walk():
+        cursor = None
+        for _ in range(pages):
+            query = dict(params, **({"cursor": cursor} if cursor else {}))
+            response = service_client.get("/emails", params=query)
+            cursor = response.headers.get("X-Next-Cursor")
+            if response.status_code >= 400 or not cursor:
+                break
+        return response
+    return walk
+
+
+def _take(ctx, count: int) -> list:
+    """IDs no earlier delete has used (fewer once the mailbox is used up)."""
+    pool = ctx["deletable"]
+    taken = pool[-count:]
+    del pool[-count:]
+    return taken
+
+
+def _tool(name: str, *args, **kwargs):
+    def call():
+        import email_tools
+        return getattr(email_tools, name)(*args, **kwargs)
+    return call
+
+
+ENDPOINT_SCENARIOS = {
+    "list": lambda rng, ctx: _request("GET", "/emails", params={"limit": 50}),
+    "list_summary": lambda rng, ctx: _request("GET", "/emails", params={"limit": 50, "view": "summary"}),
+    "list_5_pages": lambda rng, ctx: _walk_pages(5, limit=50, view="summary"),
+    "unread": lambda rng, ctx: _request("GET", "/emails/unread", params={"limit": 50}),
+    "search": lambda rng, ctx: _request("GET", "/emails/search", params={"q": rng.choice(ctx["words"]), "limit": 20}),
+    "filter_sender_unread": lambda rng, ctx: _request(
+        "GET", "/emails/filter", params={"sender": rng.choice(KNOWN_SENDERS), "read": "false", "limit": 50}
+    ),
+    "filter_dates": lambda rng, ctx: _request(
+        "GET", "/emails/filter", params=dict(zip(("start_date", "end_date"), _window(rng, ctx)), limit=50)
+    ),
+    "get_email": lambda rng, ctx: _request("GET", f"/emails/{rng.randint(1, ctx['emails'])}"),
+    "changes": lambda rng, ctx: _request("GET", "/emails/changes", params={"since": ctx["last_seq"], "limit": 50}),
+    "mark_read": lambda rng, ctx: _request(
+        "PATCH", f"/emails/{rng.randint(1, ctx['emails'])}/{rng.choice(['read', 'unread'])}"
+    ),
+    "bulk_read": lambda rng, ctx: _request(
+        "POST", "/emails/bulk/read", json={"ids": rng.sample(range(1, ctx["emails"] + 1), 20)}
+    ),
+    "bulk_unread": lambda rng, ctx: _request(
+        "POST", "/emails/bulk/unread", json={"ids": rng.sample(range(1, ctx["emails"] + 1), 20)}
+    ),
+    "send": lambda rng, ctx: _request(
+        "POST", "/send", json={"recipient": "bench@example.com", "subject": "Benchmark", "body": "Benchmark body."}
+    ),
+    "send_batch_100": lambda rng, ctx: _request(
+        "POST", "/send/batch",
+        json={"emails": [{"recipient": "bench@example.com", "subject": "Benchmark", "body": "Benchmark body."}] * 100}
+    ),
+    "cache_stats": lambda rng, ctx: _request("GET", "/cache/stats"),
+    "metrics": lambda rng, ctx: _request("GET", "/metrics"),
+    "delete": lambda rng, ctx: _request("DELETE", f"/emails/{(_take(ctx, 1) or [0])[0]}"),
+    "bulk_delete": lambda rng, ctx: _request("POST", "/emails/bulk/delete", json={"ids": _take(ctx, DELETE_BATCH)}),
+    "reset_database": lambda rng, ctx: _request("GET", "/reset_database"),
+}
+
+TOOL_SCENARIOS = {
+    "tool:list_all_emails": lambda rng, ctx: _tool("list_all_emails"),
+    "tool:list_unread_emails": lambda rng, ctx: _tool("list_unread_emails"),
+    "tool:search_emails": lambda rng, ctx: _tool("search_emails", rng.choice(ctx["words"])),
+    "tool:filter_emails": lambda rng, ctx: _tool(
+        "filter_emails", **dict(zip(("start_date", "end_date"), _window(rng, ctx)))
+    ),
+    "tool:search_unread_from_sender": lambda rng, ctx: _tool("search_unread_from_sender", rng.choice(KNOWN_SENDERS)),
+    "tool:get_email": lambda rng, ctx: _tool("get_email", rng.randint(1, ctx["emails"])),
+    "tool:get_changes": lambda rng, ctx: _tool("get_changes", ctx["last_seq"]),
+    "tool:mark_email_as_read": lambda rng, ctx: _tool("mark_email_as_read", rng.randint(1, ctx["emails"])),
+    "tool:mark_email_as_unread": lambda rng, ctx: _tool("mark_email_as_unread", rng.randint(1, ctx["emails"])),
+    "tool:mark_emails_as_read": lambda rng, ctx: _tool(
+        "mark_emails_as_read", rng.sample(range(1, ctx["emails"] + 1), 20)
+    ),
+    "tool:mark_emails_as_unread": lambda rng, ctx: _tool(
+        "mark_emails_as_unread", rng.sample(range(1, ctx["emails"] + 1), 20)
+    ),
+    "tool:send_email": lambda rng, ctx: _tool("send_email", "bench@example.com", "Benchmark", "Benchmark body."),
+    "tool:delete_email": lambda rng, ctx: _tool("delete_email", (_take(ctx, 1) or [0])[0]),
+    "tool:delete_emails": lambda rng, ctx: _tool("delete_emails", _take(ctx, DELETE_BATCH)),
+}
+
+SCENARIOS = dict(ENDPOINT_SCENARIOS, **TOOL_SCENARIOS)
+
+# Scenarios that remove emails other scenarios may pick, and the one that
+# replaces the whole mailbox; see run_order()
+DELETING_SCENARIOS = {"delete", "bulk_delete", "tool:delete_email", "tool:delete_emails"}
+RESET_SCENARIOS = {"reset_database"}
+DELETE_BATCH = 5  # IDs per bulk delete; keeps a default run within a 10,000-email mailbox
+
+
+def run_order(names: list) -> list:
+    """`names` in the order given, with deleting scenarios moved after the rest and resets last."""
+    return sorted(names, key=lambda name: (name in RESET_SCENARIOS, name in DELETING_SCENARIOS))
+
+
+# ================================
+# Runner
+# ================================
+
+def summarize(latencies: list, seconds: float, errors: int) -> dict:
+    """Latency percentiles (ms) and throughput for one scenario."""
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def _failed(result) -> bool:
+    status = getattr(result, "status_code", None)
+    if status is not None:
+        return status >= 400
+    return isinstance(result, dict) and "detail" in result
+
+
+def run_scenario(name: str, requests: int, concurrency: int, context: dict, seed: int, warmup: int = 20) -> dict:
+    """Run `requests` operations of scenario `name` from `concurrency` threads."""
+    rng = random.Random(f"{seed}:{name}")
+    operations = [SCENARIOS[name](rng, context) for _ in range(requests + warmup)]
+    for operation in operations[:warmup]:
+        operation()
+
+    def timed(operation):
+        started = time.perf_counter()
+        try:
+            failed = _failed(operation())
+        except Exception:
+            failed = True
+        return time.perf_counter() - started, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, operations[warmup:]))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ in results], elapsed, sum(failed for _, failed in results))
+
+
+def run_export() -> dict:
+    """Stream the whole mailbox once through /emails/export."""
+    import service_client
+
+    started = time.perf_counter()
+    rows = sum(1 for line in service_client.stream_lines("/emails/export", params={"format": "ndjson"}) if line)
+    seconds = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(seconds, 3), "rows_per_sec": round(rows / seconds, 1)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: dict) -> None:
+    print(f"\n  {'Scenario':<32} {'RPS':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Errors':>7}")
+    print("-" * 80)
+    for name, row in results["scenarios"].items():
+        print(f"  {name:<32} {row['throughput_rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}")
+    if "export" in results:
+        print(f"\n  export: {results['export']['rows']} rows, {results['export']['rows_per_sec']} rows/sec")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=10000, help="Synthetic mailbox size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--transport", choices=["uvicorn", "inprocess"], default="uvicorn")
+    parser.add_argument("--app", default="email_service:app", help="ASGI app to serve with uvicorn")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="Operations per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--no-export", action="store_true", help="Skip the full-mailbox export")
+    parser.add_argument("--no-response-cache", action="store_true", help="Run the service with RESPONSE_CACHE_TTL=0")
+    parser.add_argument("--out", help="Result file (default benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    # Work on a copy so every run starts from the same mailbox
+    mailbox = ensure_mailbox(args.emails, args.seed)
+    workdir = os.path.join(DATA_DIR, f"run-{os.getpid()}.db")
+    shutil.copyfile(mailbox, workdir)
+
+    service_env = {"DATABASE_URL": f"sqlite:///{workdir}"}
+    if args.no_response_cache:
+        service_env["RESPONSE_CACHE_TTL"] = "0"
+    # Measure the service, not the client's revalidation cache
+    client_env = {"EMAIL_SERVICE_CONDITIONAL_CACHE": "0", "EMAIL_SERVICE_POOL_SIZE": str(args.concurrency)}
+    server = None
+    if args.transport == "uvicorn":
+        from benchmarks.bench_async import start_server
+
+        client_env["EMAIL_SERVICE_URL"] = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.app, args.port, service_env)
+    else:
+        client_env["EMAIL_SERVICE_TRANSPORT"] = "inprocess"
+        os.environ.update(service_env)
+    os.environ.update(client_env)
+
+    try:
+        import service_client
+
+        context = {
+            "emails": args.emails,
+            "words": COMMON_WORDS,
+            "last_seq": max(service_client.get("/emails/changes").json()["last_seq"] - 50, 0),
+            "deletable": random.Random(f"{args.seed}:deletable").sample(range(1, args.emails + 1), args.emails),
+        }
+        results = {
+            "meta": {
+                "commit": _git_commit(),
+                "started": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "args": vars(args),
+            },
+            "scenarios": {},
+        }
+        scenarios = run_order(args.scenarios)
+        # Export the mailbox before any scenario removes emails from it
+        destructive = next((i for i, name in enumerate(scenarios) if name in DELETING_SCENARIOS | RESET_SCENARIOS), len(scenarios))
+        for index, name in enumerate(scenarios):
+            if index == destructive and not args.no_export:
+                results["export"] = run_export()
+            results["scenarios"][name] = run_scenario(name, args.requests, args.concurrency, context, args.seed)
+            print(f"  {name}: {results['scenarios'][name]['p50_ms']} ms p50", file=sys.stderr)
+        if "export" not in results and not args.no_export:
+            results["export"] = run_export()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        else:
+            import service_client
+            service_client.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(workdir + suffix):
+                try:
+                    os.remove(workdir + suffix)
+                except OSError:
+                    pass
+
+    print_results(results)
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# ================================
+# Tool Result Compaction
+# ================================
+"""
+Shrink tool results before they are fed back to the model.
+
+Every tool result stays in the conversation for the rest of the run, so
+a few list pages and full email bodies make every later model call
+slower and more expensive. A Compactor sits between tool execution and
+the next model call:
+
+    long text fields (TEXT_FIELDS)   cut to max_chars, with a note of how much was cut
+    long lists (pages of emails)     the first max_items entries, plus "<key>_omitted": count
+
+IDs, addresses, timestamps and cursors are never cut. When an email's
+body is cut, its note and "body_next_offset" give the get_email call
+(with body_offset) that reads on from the cut, so a long body can be
+read in full, one piece per call. When a list is cut, the result's
+continuation fields (next_cursor, last_seq, has_more) are dropped, since
+paging on from them would skip the omitted entries; "retry_with_limit"
+tells the model the page size that fits instead.
+
+The results of one turn must also fit a token budget, estimated locally
+with tracer.estimate_tokens (tiktoken when installed, else ~4 characters
+per token). While the turn is over budget, the largest result is
+compacted again with half the limits; a result that still does not fit
+at the tightest level is replaced by a summary of its shape (counts, no
+entries) asking the model to call again with a smaller limit. A result
+is never sent larger than it was.
+
+agent.run_agent() compacts every turn. For aisuite's own tool loop
+(max_turns), wrap the tools instead; each result is then held to the
+budget on its own:
+
+    compactor = Compactor()
+    tools = compactor.wrap_all([email_tools.list_all_emails, email_tools.get_email])
+
+stats() reports tokens before and after compaction and the tokens saved.
+Configuration is read from the environment:
+
+    AGENT_TOKEN_BUDGET      Tokens of tool results per turn (default 2000, 0 disables the budget)
+    AGENT_MAX_STRING_CHARS  Longest string kept whole (default 1000)
+    AGENT_MAX_LIST_ITEMS    Longest list kept whole (default 20)
+"""
+
+import os
+import json
+import functools
+import threading
+from typing import Callable, List
+
+from tracer import estimate_tokens
+
+TOKEN_BUDGET = int(os.getenv("AGENT_TOKEN_BUDGET", "2000"))
+MAX_STRING_CHARS = int(os.getenv("AGENT_MAX_STRING_CHARS", "1000"))
+MAX_LIST_ITEMS = int(os.getenv("AGENT_MAX_LIST_ITEMS", "20"))
+
+# Free-text fields that may be cut
+TEXT_FIELDS = {"body", "snippet", "subject", "message", "detail", "error"}
+
+# Fields that continue a list from where the result ends; wrong once the list is cut
+CONTINUATION_FIELDS = ("next_cursor", "last_seq", "has_more")
+
+# The tightest limits tried before a result is replaced by a summary
+MIN_STRING_CHARS = 40
+MIN_LIST_ITEMS = 1
+
+
+def _cut(text: str, max_chars: int, hint: str = "") -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars{hint}]"
+
+
+def compact(value, max_chars: int = MAX_STRING_CHARS, max_items: int = MAX_LIST_ITEMS):
+    """
+    Return `value` (a JSON-like tool result) with long text fields cut and long lists shortened.
+
+    Args:
+        value: The tool result.
+        max_chars: TEXT_FIELDS strings longer than this are cut.
+        max_items: Lists longer than this keep their first max_items entries.
+    """
+    if isinstance(value, dict):
+        compacted = {}
+        cut = False
+        for key, item in value.items():
+            if isinstance(item, str) and key in TEXT_FIELDS:
+                if key == "body" and len(item) > max_chars and "id" in value:
+                    # Point the model at the rest of the body
+                    offset = value.get("body_offset", 0) + max_chars
+                    compacted[key] = _cut(item, max_chars, f"; get_email(email_id={value['id']}, body_offset={offset}) reads on")
+                    compacted["body_next_offset"] = offset
+                else:
+                    compacted[key] = _cut(item, max_chars)
+            elif isinstance(item, list) and len(item) > max_items:
+                compacted[key] = [compact(entry, max_chars, max_items) for entry in item[:max_items]]
+                compacted[f"{key}_omitted"] = len(item) - max_items
+                cut = True
+            else:
+                compacted[key] = compact(item, max_chars, max_items)
+        if cut:
+            for key in CONTINUATION_FIELDS:
+                compacted.pop(key, None)
+            compacted["retry_with_limit"] = max_items
+            compacted["note"] = (
+                f"Only the first {max_items} results fit; call again with limit={max_items} "
+                "to page through all of them."
+            )
+        return compacted
+    if isinstance(value, list):
+        compacted = [compact(entry, max_chars, max_items) for entry in value[:max_items]]
+        if len(value) > max_items:
+            compacted.append({"omitted": len(value) - max_items})
+        return compacted
+    return value
+
+
+def summarize(value) -> dict:
+    """
+    Describe a result too large to send even compacted: its scalar fields and list sizes, no entries.
+    """
+    summary = {"truncated": True}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, list):
+                summary[f"{key}_count"] = len(item)
+            elif key in CONTINUATION_FIELDS or key in TEXT_FIELDS or isinstance(item, dict):
+                continue
+            else:
+                summary[key] = item
+    elif isinstance(value, list):
+        summary["count"] = len(value)
+    summary["note"] = "This result was too large to include; call again with a smaller limit."
+    return summary
+
+
+def _levels(max_chars: int, max_items: int) -> list:
+    """(max_chars, max_items) limits from the configured ones down to the tightest."""
+    levels = [(max_chars, max_items)]
+    while levels[-1] != (MIN_STRING_CHARS, MIN_LIST_ITEMS):
+        chars, items = levels[-1]
+        levels.append((max(MIN_STRING_CHARS, chars // 2), max(MIN_LIST_ITEMS, items // 2)))
+    return levels
+
+
+def _encode(value) -> str:
+    return json.dumps(value, default=str)
+
+
+class Compactor:
+    """Compacts tool results to a per-turn token budget and counts the tokens saved."""
+
+    def __init__(self, budget: int = TOKEN_BUDGET, max_chars: int = MAX_STRING_CHARS,
+                 max_items: int = MAX_LIST_ITEMS):
+        self.budget = budget
+        self.levels = _levels(max_chars, max_items)
+        self._lock = threading.Lock()
+        self._stats = {
+            "turns": 0, "results": 0, "compacted": 0, "summarized": 0, "over_budget": 0,
+            "tokens_before": 0, "tokens_after": 0,
+        }
+
+    def compact_turn(self, results: list) -> List[str]:
+        """
+        Encode one turn's tool results for the model, within the token budget.
+
+        Args:
+            results: The turn's tool results, in call order.
+
+        Returns:
+            The JSON content for each result, in the same order.
+        """
+        originals = [_encode(result) for result in results]
+        tokens_before = [estimate_tokens(content) for content in originals]
+        contents = [_encode(compact(result, *self.levels[0])) for result in results]
+        tokens = [estimate_tokens(content) for content in contents]
+        level = [0] * len(results)
+        summarized = 0
+
+        # Tighten the largest result first until the turn fits
+        while self.budget and sum(tokens) > self.budget:
+            candidates = [index for index in range(len(results)) if level[index] + 1 < len(self.levels)]
+            if not candidates:
+                break
+            index = max(candidates, key=lambda i: tokens[i])
+            level[index] += 1
+            contents[index] = _encode(compact(results[index], *self.levels[level[index]]))
+            tokens[index] = estimate_tokens(contents[index])
+
+        if self.budget and sum(tokens) > self.budget:
+            # Even the tightest limits do not fit: summarize results over an equal share
+            share = self.budget // len(results)
+            for index in range(len(results)):
+                if tokens[index] > share:
+                    contents[index] = _encode(summarize(results[index]))
+                    tokens[index] = estimate_tokens(contents[index])
+                    summarized += 1
+
+        # Never make a result bigger than it was
+        for index, original in enumerate(originals):
+            if tokens[index] >= tokens_before[index]:
+                contents[index], tokens[index] = original, tokens_before[index]
+
+        with self._lock:
+            stats = self._stats
+            stats["turns"] += 1
+            stats["results"] += len(results)
+            stats["compacted"] += sum(content != original for content, original in zip(contents, originals))
+            stats["summarized"] += summarized
+            stats["over_budget"] += bool(self.budget and sum(tokens) > self.budget)
+            stats["tokens_before"] += sum(tokens_before)
+            stats["tokens_after"] += sum(tokens)
+        return contents
+
+    # ---- wrapping ----
+
+    def wrap(self, tool: Callable) -> Callable:
+        """
+        Return `tool` with its result compacted on its own, for client-run tool loops.
+
+        The wrapper returns the compacted value rather than a JSON string,
+        so the client encodes it as usual.
+        """
+        @functools.wraps(tool)
+        def compacted(*args, **kwargs):
+            return json.loads(self.compact_turn([tool(*args, **kwargs)])[0])
+
+        return compacted
+
+    def wrap_all(self, tools: List[Callable]) -> List[Callable]:
+        return [self.wrap(tool) for tool in tools]
+
+    # ---- statistics ----
+
+    def stats(self) -> dict:
+        """Results seen and compacted, and estimated tokens before, after and saved."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+        stats["saved_ratio"] = round(stats["tokens_saved"] / stats["tokens_before"], 3) if stats["tokens_before"] else 0.0
+        return stats
@@ -2,15 +2,70 @@
 # FastAPI Email Service Backend
 # ================================
 
-from fastapi import FastAPI, HTTPException, Query, Depends
+import io
+import os
+import re
+import csv
+import json
+import time
+import base64
+import sqlite3
+import secrets
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import create_engine, select, insert, update, delete, func, literal_column, text, and_, or_, tuple_, Float, Integer, DateTime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import datetime
+from pydantic import TypeAdapter
+from typing import Optional, List, Literal, Callable
+from datetime import datetime, timezone
 
-from models import Email, get_db, Base, engine, INITIAL_EMAILS
-from schemas import EmailCreate, EmailResponse
+import metrics
+from models import (
+    Email, EmailChange, get_db, SessionLocal, Base, engine, INITIAL_EMAILS, SEARCH_BACKEND, FTS_TABLE,
+    pg_search_document, prune_change_log, init_schema, change_log_supported,
+)
+from schemas import EmailCreate, EmailBatch, EmailResponse, BulkEmailAction, BulkActionResponse, ChangeFeed
 
 app = FastAPI(title="Email Service API", version="1.0.0")
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING, used by seed_database
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Keyset order shared by every list endpoint: newest first, ties broken by id
+NEWEST_FIRST = [(Email.timestamp, True), (Email.id, True)]
+
+# Fields a list endpoint can project to with ?fields= or ?view=summary.
+# "snippet" is the first SNIPPET_LENGTH characters of the body, cut in SQL.
+SNIPPET_LENGTH = 160
+PROJECTABLE_FIELDS = ["id", "sender", "recipient", "subject", "body", "snippet", "timestamp", "read"]
+SUMMARY_FIELDS = ["id", "sender", "subject", "timestamp", "read", "snippet"]
+FULL_FIELDS = list(EmailResponse.model_fields)
+
+# Long-polling /emails/changes: the longest ?wait= accepted, and how often
+# a waiting request re-reads the change log to catch writes made by other
+# processes (writes in this process wake it immediately).
+MAX_CHANGES_WAIT = 30.0
+CHANGES_POLL_INTERVAL = 1.0
+
+# /emails/export: rows fetched (and written out) per round trip
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# /send/batch and import_mail: rows per multi-row INSERT statement
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "500"))
 
 
 # ================================
@@ -18,21 +73,819 @@ app = FastAPI(title="Email Service API", version="1.0.0")
 # ================================
 
 def seed_database(db: Session):
-    """Seed the database with initial emails."""
-    for email_data in INITIAL_EMAILS:
-        existing = db.query(Email).filter(Email.id == email_data["id"]).first()
-        if not existing:
-            email = Email(
-                id=email_data["id"],
-                sender=email_data["sender"],
-                recipient=email_data["recipient"],
-                subject=email_data["subject"],
-                body=email_data["body"],
-                timestamp=datetime.utcnow(),
-                read=email_data["read"]
+    """
+    Seed the database with initial emails, skipping IDs already present.
+
+    One INSERT ... ON CONFLICT DO NOTHING where the dialect supports it;
+    elsewhere the existing seed IDs are selected first and only the
+    missing rows are inserted.
+    """
+    dialect = db.get_bind().dialect.name
+    now = datetime.utcnow()
+    rows = [dict(email_data, timestamp=now) for email_data in INITIAL_EMAILS]
+    if dialect in UPSERT_DIALECTS:
+        db.execute(UPSERT_DIALECTS[dialect](Email).values(rows).on_conflict_do_nothing(index_elements=[Email.id]))
+    else:
+        existing = set(db.scalars(select(Email.id).where(Email.id.in_([row["id"] for row in rows]))))
+        missing = [row for row in rows if row["id"] not in existing]
+        if missing:
+            db.execute(insert(Email), missing)
+    db.commit()
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Explicit seed IDs bypass the serial sequence; move it past them
+        db.execute(text(
+            "SELECT setval(pg_get_serial_sequence('emails', 'id'), "
+            "(SELECT COALESCE(MAX(id), 0) + 1 FROM emails), false)"
+        ))
+        db.commit()
+
+
+def reset_emails(db: Session):
+    """
+    Put the mailbox back in its initial state.
+
+    In "snapshot" mode (SQLite only) the database is overwritten from the
+    template snapshot; otherwise all emails are deleted and re-seeded.
+    """
+    if RESET_MODE == "snapshot" and snapshot_supported(db):
+        db.commit()
+        restore_snapshot()
+        return
+
+    # Delete all emails
+    db.query(Email).delete()
+    db.commit()
+
+    # Re-seed with initial data
+    seed_database(db)
+
+
+# ================================
+# Reset Snapshot
+# ================================
+# EMAIL_RESET_MODE=snapshot resets by copying a template database over the
+# live one with SQLite's online backup API: one page copy instead of a
+# DELETE plus INSERTs, however large the fixture set. The template is the
+# file named by EMAIL_RESET_SNAPSHOT (built beforehand, e.g. by seeding a
+# scratch database and importing fixtures with import_mail.py), or, by
+# default, a freshly seeded in-memory database. Either way it is held in
+# memory for the life of the process.
+#
+# The change log is copied along with everything else, so afterwards it
+# is rewritten to one "insert" per email, numbered past a deliberate gap
+# after the old sequence: every feed client gets a 410 and resyncs.
+
+RESET_MODE = os.getenv("EMAIL_RESET_MODE", "seed")  # "seed" or "snapshot"
+RESET_SNAPSHOT = os.getenv("EMAIL_RESET_SNAPSHOT")
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite" and engine.dialect.name == "sqlite"
+
+
+def build_snapshot() -> sqlite3.Connection:
+    """Load the reset template into a private in-memory SQLite database."""
+    snapshot = sqlite3.connect(":memory:", check_same_thread=False)
+    if RESET_SNAPSHOT:
+        with closing(sqlite3.connect(f"file:{RESET_SNAPSHOT}?mode=ro", uri=True)) as template:
+            template.backup(snapshot)
+        return snapshot
+
+    template = create_engine("sqlite://", creator=lambda: snapshot, poolclass=StaticPool)
+    init_schema(template)
+    with Session(template) as db:
+        seed_database(db)
+    return snapshot
+
+
+def restore_snapshot() -> None:
+    """Overwrite the live database with the reset template."""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = build_snapshot()
+        connection = engine.raw_connection()
+        try:
+            live = connection.driver_connection
+            last_seq = live.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'email_changes'"
+            ).fetchone()[0]
+            _snapshot.backup(live)
+            live.execute("DELETE FROM email_changes")
+            live.execute("DELETE FROM sqlite_sequence WHERE name = 'email_changes'")
+            live.execute("INSERT INTO sqlite_sequence(name, seq) VALUES ('email_changes', ?)", (last_seq + 1,))
+            live.execute("INSERT INTO email_changes(email_id, op) SELECT id, 'insert' FROM emails ORDER BY id")
+            live.commit()
+        finally:
+            connection.close()
+
+
+def _search_terms(q: str) -> list:
+    """
+    Split a free-text search into (text, is_phrase) terms.
+
+    Quoted segments are phrases, everything else is split on whitespace;
+    terms without any word character are dropped.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q):
+        term = (phrase or word).replace('"', '')
+        if re.search(r"\w", term):
+            terms.append((term, bool(phrase)))
+    return terms
+
+
+def build_fts_query(q: str) -> Optional[str]:
+    """
+    Translate a free-text search into an FTS5 MATCH expression.
+
+    Quoted segments become phrase queries and bare words become prefix
+    terms, so `"q3 report" rev` matches the phrase "q3 report" plus any
+    word starting with "rev". Returns None if nothing searchable is left.
+    """
+    terms = [f'"{term}"' if phrase else f'"{term}"*' for term, phrase in _search_terms(q)]
+    return " ".join(terms) or None
+
+
+def build_tsquery(q: str) -> Optional[str]:
+    """PostgreSQL to_tsquery() counterpart of build_fts_query()."""
+    terms = []
+    for term, phrase in _search_terms(q):
+        quoted = "'" + term.replace("\\", "\\\\").replace("'", "''") + "'"
+        terms.append(quoted if phrase else f"{quoted}:*")
+    return " & ".join(terms) or None
+
+
+def encode_cursor(values: list) -> str:
+    """Pack the sort-key values of the last row on a page into an opaque cursor."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: list) -> list:
+    """Unpack a cursor produced by encode_cursor() for the given sort keys."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("cursor does not match this endpoint")
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for (column, _), value in zip(keys, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(keys: list, values: list):
+    """WHERE clause selecting rows strictly after `values` in `keys` order."""
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        # Row-value comparison lets the index seek straight to the cursor
+        columns = tuple_(*[column for column, _ in keys])
+        return columns < tuple_(*values) if directions.pop() else columns > tuple_(*values)
+
+    clause = None
+    for (column, descending), value in reversed(list(zip(keys, values))):
+        beyond = column < value if descending else column > value
+        clause = beyond if clause is None else or_(beyond, and_(column == value, clause))
+    return clause
+
+
+def page_query(statement, keys: list, limit: int, cursor: Optional[str]):
+    """
+    Order and bound a select() for one keyset page.
+
+    One extra row is requested so the caller can tell whether a next page exists.
+    """
+    if cursor:
+        statement = statement.where(_after(keys, decode_cursor(cursor, keys)))
+    order = [column.desc() if descending else column.asc() for column, descending in keys]
+    return statement.order_by(*order).limit(limit + 1)
+
+
+def finish_page(rows: list, keys: list, limit: int, response: Response, fields: Optional[list] = None):
+    """
+    Turn the rows fetched for page_query() into a page.
+
+    Drops the look-ahead row and sets X-Next-Cursor on `response` when
+    more rows exist. Returns the Email of each row, or, for a projection,
+    a JSONResponse of {field: value} rows that skips response_model
+    validation entirely.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(_key_values(rows[-1], keys))
+    if fields is None:
+        return [row[0] for row in rows]
+
+    headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else None
+    with metrics.time_serialization():
+        content = jsonable_encoder([{field: row._mapping[field] for field in fields} for row in rows])
+        return JSONResponse(content, headers=headers)
+
+
+def paginate(
+    db: Session,
+    statement,
+    keys: list,
+    limit: int,
+    cursor: Optional[str],
+    response: Response,
+    fields: Optional[list] = None
+):
+    """
+    Fetch one keyset page of a select().
+
+    Args:
+        db: Database session.
+        statement: The filtered (unordered) select; the Email entity comes first.
+        keys: (column, descending) pairs defining a total order; the last key must be unique.
+        limit: Page size.
+        cursor: Cursor from the previous page's X-Next-Cursor header, if any.
+        response: Response that receives X-Next-Cursor when more rows exist.
+        fields: Optional projection from projected_fields().
+
+    Returns:
+        The emails of the requested page (see finish_page()).
+    """
+    if fields is not None:
+        statement = project(statement, fields, keys)
+    rows = db.execute(page_query(statement, keys, limit, cursor)).all()
+    return finish_page(rows, keys, limit, response, fields)
+
+
+def projected_fields(view: str, fields: Optional[str]) -> Optional[list]:
+    """
+    Resolve the ?view= and ?fields= parameters into a list of field names.
+
+    Returns None for the default full view (whole Email rows).
+    """
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(names) - set(PROJECTABLE_FIELDS))
+        if unknown or not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields {unknown}; choose from {PROJECTABLE_FIELDS}"
             )
-            db.add(email)
+        return list(dict.fromkeys(names))
+    if view == "summary":
+        return SUMMARY_FIELDS
+    return None
+
+
+def projection_columns(fields: list) -> list:
+    """The Email columns (or SQL expressions, for "snippet") behind `fields`."""
+    return [
+        func.substr(Email.body, 1, SNIPPET_LENGTH).label("snippet") if field == "snippet"
+        else Email.__table__.c[field]
+        for field in fields
+    ]
+
+
+def project(statement, fields: list, keys: list):
+    """
+    Narrow a select(Email, ...) to the requested columns.
+
+    The sort-key columns are always selected too, so the cursor can be
+    built, but only `fields` end up in the response.
+    """
+    columns = projection_columns(fields)
+    columns += [column for column, _ in keys if column.key not in fields]
+    return statement.with_only_columns(*columns)
+
+
+def _key_values(row, keys: list) -> list:
+    """Read the sort-key values off an (Email, extra columns...) result row."""
+    mapping = row._mapping
+    return [mapping[column.key] if column.key in mapping else getattr(row[0], column.key)
+            for column, _ in keys]
+
+
+# ================================
+# Query Builders
+# ================================
+# Plain select() statements, shared by the sync and async services.
+
+def list_query():
+    """All emails (the /emails query shape)."""
+    return select(Email)
+
+
+def unread_query():
+    """Unread emails (the /emails/unread query shape)."""
+    return select(Email).where(Email.read == False)
+
+
+def filter_conditions(
+    recipient: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    sender: Optional[str] = None,
+    read: Optional[bool] = None
+) -> list:
+    """WHERE conditions for the /emails/filter criteria."""
+    conditions = []
+
+    if recipient:
+        conditions.append(Email.recipient == recipient)
+    if sender:
+        # Matches the lower(sender) expression index
+        conditions.append(func.lower(Email.sender) == sender.lower())
+    if read is not None:
+        conditions.append(Email.read == read)
+    if start_date:
+        conditions.append(Email.timestamp >= start_date)
+    if end_date:
+        conditions.append(Email.timestamp <= end_date)
+
+    return conditions
+
+
+def filter_query(
+    recipient: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    sender: Optional[str] = None,
+    read: Optional[bool] = None
+):
+    """Emails matching the /emails/filter criteria."""
+    return select(Email).where(*filter_conditions(recipient, start_date, end_date, sender, read))
+
+
+def fts_search_query(match: str) -> tuple:
+    """
+    Ranked FTS5 search (best match first, then newest).
+
+    Returns:
+        (statement, keys) for page_query().
+    """
+    # bm25 column weights: subject, body, sender
+    hits = text(
+        f"SELECT rowid AS id, bm25({FTS_TABLE}, 3.0, 1.0, 2.0) AS rank "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    ).bindparams(match=match).columns(id=Integer, rank=Float).subquery()
+    statement = select(Email, hits.c.rank).join(hits, hits.c.id == Email.id)
+    return statement, [(hits.c.rank, False)] + NEWEST_FIRST
+
+
+def pg_search_query(tsquery: str) -> tuple:
+    """
+    Ranked PostgreSQL full-text search (best match first, then newest).
+
+    Returns:
+        (statement, keys) for page_query().
+    """
+    document = pg_search_document()
+    query = func.to_tsquery(literal_column("'simple'::regconfig"), tsquery)
+    hits = (
+        select(Email.id.label("id"), func.ts_rank(document, query).label("rank"))
+        .where(document.op("@@")(query))
+        .subquery()
+    )
+    statement = select(Email, hits.c.rank).join(hits, hits.c.id == Email.id)
+    return statement, [(hits.c.rank, True)] + NEWEST_FIRST
+
+
+def ranked_search_query(q: str) -> Optional[tuple]:
+    """
+    (statement, keys) for an index-backed, ranked search of `q`.
+
+    Returns None when the database has no search index or `q` has no
+    searchable terms; callers then use like_search_query().
+    """
+    if SEARCH_BACKEND == "fts5":
+        match = build_fts_query(q)
+        return fts_search_query(match) if match else None
+    if SEARCH_BACKEND == "postgres":
+        tsquery = build_tsquery(q)
+        return pg_search_query(tsquery) if tsquery else None
+    return None
+
+
+def changes_query(since: int, limit: int, fields: list):
+    """
+    Change log entries after `since`, oldest first, each joined to the
+    current state of its email (projected to `fields`).
+
+    One extra row is requested so the caller can tell whether more exist.
+    """
+    return (
+        select(
+            EmailChange.seq, EmailChange.email_id, EmailChange.op, EmailChange.changed_at,
+            Email.id.label("current_id"), *projection_columns(fields),
+        )
+        .outerjoin(Email, Email.id == EmailChange.email_id)
+        .where(EmailChange.seq > since)
+        .order_by(EmailChange.seq)
+        .limit(limit + 1)
+    )
+
+
+def like_search_query(q: str):
+    """Substring search over subject, body and sender (full table scan)."""
+    return select(Email).where(
+        (Email.subject.ilike(f"%{q}%")) |
+        (Email.body.ilike(f"%{q}%")) |
+        (Email.sender.ilike(f"%{q}%"))
+    )
+
+
+# ================================
+# Bulk Mutations
+# ================================
+
+def bulk_conditions(action: BulkEmailAction) -> list:
+    """WHERE conditions selecting the emails targeted by a bulk action."""
+    conditions = []
+    if action.ids is not None:
+        conditions.append(Email.id.in_(action.ids))
+    if action.filter is not None:
+        conditions.extend(filter_conditions(**action.filter.model_dump()))
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Provide ids and/or at least one filter field")
+    return conditions
+
+
+def _execute_returning_ids(db: Session, statement, conditions: list) -> List[int]:
+    """
+    Run a bulk UPDATE/DELETE and return the IDs of the affected rows.
+
+    Uses RETURNING where the database supports it; otherwise selects the
+    IDs first, inside the same transaction.
+    """
+    dialect = db.get_bind().dialect
+    returning = dialect.update_returning if statement.is_update else dialect.delete_returning
+    if returning:
+        ids = db.scalars(statement.returning(Email.id)).all()
+    else:
+        ids = db.scalars(select(Email.id).where(*conditions)).all()
+        if ids:
+            db.execute(statement)
     db.commit()
+    return sorted(ids)
+
+
+def bulk_set_read(db: Session, action: BulkEmailAction, read: bool) -> List[int]:
+    """Set the read flag on every targeted email in one UPDATE; returns the IDs that changed."""
+    conditions = bulk_conditions(action) + [Email.read != read]
+    statement = (
+        update(Email).where(*conditions).values(read=read, version=Email.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return _execute_returning_ids(db, statement, conditions)
+
+
+def naive_utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """`timestamp` as naive UTC, how emails.timestamp is stored; naive values are taken as UTC already."""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def email_rows(emails) -> List[dict]:
+    """
+    Turn EmailCreate/EmailImport-like dicts into complete emails rows.
+
+    Every row gets the same keys, as one executemany requires; missing
+    timestamps default to now, and timestamps with an offset are
+    converted to naive UTC.
+    """
+    now = datetime.utcnow()
+    return [
+        {
+            "sender": email.get("sender") or "you@email.com",
+            "recipient": email["recipient"],
+            "subject": email["subject"],
+            "body": email["body"],
+            "timestamp": naive_utc(email.get("timestamp")) or now,
+            "read": bool(email.get("read", False)),
+        }
+        for email in emails
+    ]
+
+
+def insert_emails(db: Session, rows: List[dict], batch_size: int = INSERT_BATCH_SIZE) -> List[int]:
+    """
+    Insert complete emails rows with Core INSERTs, batch_size rows per statement.
+
+    Does not commit, so the caller decides the transaction boundaries.
+    The FTS index and change log are kept current by their triggers.
+
+    Returns:
+        The new IDs, in the order of `rows`.
+    """
+    ids = []
+    statement = insert(Email).returning(Email.id, sort_by_parameter_order=True)
+    for start in range(0, len(rows), batch_size):
+        ids += db.scalars(statement, rows[start:start + batch_size]).all()
+    return ids
+
+
+def bulk_delete(db: Session, action: BulkEmailAction) -> List[int]:
+    """Delete every targeted email in one DELETE; returns the deleted IDs."""
+    conditions = bulk_conditions(action)
+    statement = delete(Email).where(*conditions).execution_options(synchronize_session=False)
+    return _execute_returning_ids(db, statement, conditions)
+
+
+# ================================
+# Export
+# ================================
+# /emails/export streams the whole table in id order. Rows are plain
+# column tuples read EXPORT_BATCH_SIZE at a time (a server-side cursor on
+# PostgreSQL) and written out per batch, so memory stays flat no matter
+# how large the mailbox is.
+
+def export_query(fields: list):
+    """Every email, projected to `fields`, in primary key order."""
+    return (
+        select(*projection_columns(fields))
+        .order_by(Email.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE, stream_results=True)
+    )
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_chunks(format: str, fields: list):
+    """
+    Return (header, encode) for an export format.
+
+    `header` is emitted once before any rows; encode(rows) turns one batch
+    of result rows into the text for that batch.
+    """
+    if format == "csv":
+        def encode_csv(rows) -> str:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows([_export_value(value) for value in row] for row in rows)
+            return buffer.getvalue()
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(fields)
+        return buffer.getvalue(), encode_csv
+
+    def encode_ndjson(rows) -> str:
+        return "".join(
+            json.dumps(dict(zip(fields, map(_export_value, row)))) + "\n" for row in rows
+        )
+
+    return "", encode_ndjson
+
+
+def export_response(chunks, format: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="emails.{format}"'},
+    )
+
+
+# ================================
+# Change Feed
+# ================================
+
+def read_changes(db: Session, since: Optional[int], limit: int, fields: Optional[list]) -> dict:
+    """
+    Read one batch of the change feed.
+
+    Args:
+        db: Database session.
+        since: Last sequence number the caller has seen; None starts the
+            feed at the current end of the log without returning anything.
+        limit: Maximum number of changes to return.
+        fields: Optional projection from projected_fields() for the
+            embedded emails; None embeds the full email.
+
+    Returns:
+        A ChangeFeed-shaped dict.
+
+    Raises:
+        HTTPException: 410 if entries after `since` have been pruned, in
+            which case the caller must resync from the list endpoints.
+    """
+    if since is None:
+        last_seq = db.scalar(select(func.max(EmailChange.seq))) or 0
+        return {"changes": [], "last_seq": last_seq, "has_more": False}
+
+    oldest = db.scalar(select(func.min(EmailChange.seq)))
+    if oldest is not None and since + 1 < oldest:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Changes after {since} have been pruned; resync and restart from the current last_seq"
+        )
+
+    fields = fields or FULL_FIELDS
+    rows = db.execute(changes_query(since, limit, fields)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        {
+            "seq": row.seq,
+            "email_id": row.email_id,
+            "op": row.op,
+            "changed_at": row.changed_at,
+            "email": None if row.op == "delete" or row.current_id is None
+            else {field: row._mapping[field] for field in fields},
+        }
+        for row in rows
+    ]
+    return {"changes": changes, "last_seq": rows[-1].seq if rows else since, "has_more": has_more}
+
+
+# ================================
+# Response Cache
+# ================================
+# Serialized list/search pages, keyed by path + query string. Each entry
+# records the mailbox version it was built at (see mailbox_version()) and
+# is only served while the database is still at that version, so writes
+# from other workers or processes (import_mail.py) are seen immediately.
+# Every local write endpoint also calls response_cache.invalidate(), which
+# drops all entries and wakes long-polling change feed requests.
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))  # seconds, 0 disables
+
+EMAIL_LIST = TypeAdapter(List[EmailResponse])
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache of (body, headers) pairs with a version counter."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def lookup(self, key, mailbox: str = None) -> tuple:
+        """
+        Return (cached Response or None, current version).
+
+        Only an entry stored at mailbox version `mailbox` is a hit. Pass
+        the returned version back to store() so a page built while a
+        local write was in flight is never cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic() and entry[1] == mailbox:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                _, _, body, headers = entry
+                return Response(body, media_type="application/json", headers=dict(headers, **{"X-Cache": "HIT"})), self.version
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None, self.version
+
+    def store(self, key, version: int, response: Response, mailbox: str = None) -> None:
+        if self.ttl <= 0 or response.status_code != 200:
+            return
+        headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else {}
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, mailbox, response.body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Record a mailbox change: bump the version and drop every entry."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._changed.notify_all()
+
+    def wait(self, version: int, timeout: float) -> bool:
+        """Block until the version moves past `version` or `timeout` elapses; True if it moved."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version != version, timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "version": self.version,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cache_key(request: Request) -> tuple:
+    """Cache key for a request: its path plus its sorted query parameters."""
+    return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+
+def render_page(page, response: Response) -> Response:
+    """
+    Serialize a page returned by paginate() into a JSON Response.
+
+    Full pages are validated against EmailResponse exactly as
+    response_model would; the X-Next-Cursor header is carried over.
+    """
+    if isinstance(page, Response):
+        return page
+    with metrics.time_serialization():
+        body = EMAIL_LIST.dump_json(EMAIL_LIST.validate_python(page, from_attributes=True))
+    headers = {NEXT_CURSOR_HEADER: response.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in response.headers else None
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cached_page(cache: ResponseCache, request: Request, db: Session, build: Callable[[], Response]) -> Response:
+    """
+    Serve `request` from `cache`, or build, store and return the page.
+
+    Every page carries the mailbox ETag; a matching If-None-Match gets a
+    bodyless 304 after a single MAX(seq) lookup, without building the page.
+    """
+    mailbox = mailbox_version(db, cache)
+    etag = mailbox_etag(mailbox)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    key = cache_key(request)
+    cached, version = cache.lookup(key, mailbox)
+    if cached is None:
+        cached = build()
+        cache.store(key, version, cached, mailbox)
+        cached.headers["X-Cache"] = "MISS"
+    cached.headers["ETag"] = etag
+    return cached
+
+
+# ================================
+# Conditional Requests
+# ================================
+# List pages are tagged with the mailbox version and single emails with
+# their own version column. The mailbox version is read from the database
+# (the newest change log seq), so it moves on every write from any worker
+# or process and every worker computes the same tag. Read it before
+# building the page: the tag may then be older than the body, never newer.
+#
+# Dialects without change log triggers fall back to a per-process version
+# (ResponseCache.version, bumped by local writes only) prefixed with an
+# epoch that changes on every restart.
+
+SERVICE_EPOCH = secrets.token_hex(4)
+CHANGE_LOG_ENABLED = change_log_supported(engine)
+MAILBOX_VERSION_QUERY = select(func.max(EmailChange.seq))
+
+
+def local_mailbox_version(cache: ResponseCache) -> str:
+    return f"{SERVICE_EPOCH}-{cache.version}"
+
+
+def mailbox_version(db: Session, cache: ResponseCache) -> str:
+    """The mailbox version list pages are cached and tagged under."""
+    if not CHANGE_LOG_ENABLED:
+        return local_mailbox_version(cache)
+    return str(db.scalar(MAILBOX_VERSION_QUERY) or 0)
+
+
+def mailbox_etag(version: str) -> str:
+    """Weak ETag for every list page at mailbox version `version`."""
+    return f'W/"m{version}"'
+
+
+def email_etag(email: Email) -> str:
+    """
+    Weak ETag for a single email.
+
+    The timestamp is included so an id reused after a delete never
+    matches the tag of the email that used to have it.
+    """
+    stamp = int(email.timestamp.timestamp() * 1_000_000) if email.timestamp else 0
+    return f'W/"{email.id}-{email.version}-{stamp:x}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match lists `etag` (weak comparison) or is *."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
 
 
 # ================================
@@ -53,60 +906,178 @@ def send_email(email: EmailCreate, db: Session = Depends(get_db)):
     db.add(new_email)
     db.commit()
     db.refresh(new_email)
+    response_cache.invalidate()
     return {"id": new_email.id, "message": "Email sent successfully"}
 
 
+@app.post("/send/batch", response_model=BulkActionResponse)
+def send_email_batch(batch: EmailBatch, db: Session = Depends(get_db)):
+    """Send (or import) many emails in one transaction; returns their IDs in order."""
+    ids = insert_emails(db, email_rows(batch.model_dump()["emails"]))
+    db.commit()
+    response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails sent"}
+
+
+# Every list endpoint returns one page; the cursor for the next page, if any,
+# is sent back in the X-Next-Cursor response header.
+LIMIT_QUERY = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size")
+CURSOR_QUERY = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
+VIEW_QUERY = Query("full", description="'summary' returns id, sender, subject, timestamp, read and a body snippet")
+FIELDS_QUERY = Query(None, description=f"Comma-separated subset of {PROJECTABLE_FIELDS}; overrides view")
+
+
 @app.get("/emails", response_model=List[EmailResponse])
-def list_emails(db: Session = Depends(get_db)):
+def list_emails(
+    request: Request,
+    response: Response,
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
     """List all emails, newest first."""
-    emails = db.query(Email).order_by(Email.timestamp.desc()).all()
-    return emails
+    fields = projected_fields(view, fields)
+    return cached_page(response_cache, request, db, lambda: render_page(
+        paginate(db, list_query(), NEWEST_FIRST, limit, cursor, response, fields), response
+    ))
 
 
 @app.get("/emails/unread", response_model=List[EmailResponse])
-def list_unread_emails(db: Session = Depends(get_db)):
+def list_unread_emails(
+    request: Request,
+    response: Response,
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
     """List only unread emails."""
-    emails = db.query(Email).filter(Email.read == False).order_by(Email.timestamp.desc()).all()
-    return emails
+    fields = projected_fields(view, fields)
+    return cached_page(response_cache, request, db, lambda: render_page(
+        paginate(db, unread_query(), NEWEST_FIRST, limit, cursor, response, fields), response
+    ))
 
 
 @app.get("/emails/search", response_model=List[EmailResponse])
-def search_emails(q: str = Query(..., description="Search query"), db: Session = Depends(get_db)):
-    """Search emails by keyword in subject, body, or sender."""
-    emails = db.query(Email).filter(
-        (Email.subject.ilike(f"%{q}%")) |
-        (Email.body.ilike(f"%{q}%")) |
-        (Email.sender.ilike(f"%{q}%"))
-    ).order_by(Email.timestamp.desc()).all()
-    return emails
+def search_emails(
+    request: Request,
+    response: Response,
+    q: str = Query(..., description="Search query"),
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
+    """
+    Search emails by keyword in subject, body, or sender.
+
+    Uses the full-text index when available (ranked, prefix and "phrase"
+    queries), otherwise falls back to a LIKE scan.
+    """
+    fields = projected_fields(view, fields)
+
+    def search():
+        ranked = ranked_search_query(q)
+        if ranked:
+            try:
+                statement, keys = ranked
+                return paginate(db, statement, keys, limit, cursor, response, fields)
+            except DBAPIError:
+                db.rollback()
+        return paginate(db, like_search_query(q), NEWEST_FIRST, limit, cursor, response, fields)
+
+    return cached_page(response_cache, request, db, lambda: render_page(search(), response))
 
 
 @app.get("/emails/filter", response_model=List[EmailResponse])
 def filter_emails(
+    request: Request,
+    response: Response,
     recipient: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    sender: Optional[str] = Query(None, description="Sender address (case-insensitive)"),
+    read: Optional[bool] = Query(None, description="Only read (true) or unread (false) emails"),
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
     db: Session = Depends(get_db)
 ):
-    """Filter emails by recipient and/or date range."""
-    query = db.query(Email)
+    """Filter emails by recipient, sender, read state and/or date range."""
+    fields = projected_fields(view, fields)
+    query = filter_query(recipient, start_date, end_date, sender, read)
+    return cached_page(response_cache, request, db, lambda: render_page(
+        paginate(db, query, NEWEST_FIRST, limit, cursor, response, fields), response
+    ))
 
-    if recipient:
-        query = query.filter(Email.recipient == recipient)
-    if start_date:
-        query = query.filter(Email.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Email.timestamp <= end_date)
 
-    return query.order_by(Email.timestamp.desc()).all()
+@app.get("/emails/export")
+def export_emails(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    """
+    Stream every email, oldest id first, as NDJSON or CSV.
+
+    The export holds its own session for as long as the stream runs.
+    """
+    fields = projected_fields("full", fields) or FULL_FIELDS
+    header, encode = export_chunks(format, fields)
+
+    def chunks():
+        if header:
+            yield header
+        with SessionLocal() as db:
+            for batch in db.execute(export_query(fields)).partitions():
+                yield encode(batch)
+
+    return export_response(chunks(), format)
+
+
+@app.get("/emails/changes", response_model=ChangeFeed)
+def list_changes(
+    since: Optional[int] = Query(None, ge=0, description="last_seq from the previous poll; omit to start at the current end"),
+    wait: float = Query(0, ge=0, le=MAX_CHANGES_WAIT, description="Seconds to hold the request open until a change arrives"),
+    limit: int = LIMIT_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
+    """
+    Inserts, updates and deletes after `since`, oldest first, each with the
+    email's current state.
+
+    With ?wait= an empty poll is held open (long poll) until a change
+    arrives or the wait runs out. A waiting request occupies a worker
+    thread; email_service_async waits on the event loop instead.
+    """
+    fields = projected_fields(view, fields)
+    deadline = time.monotonic() + wait
+    while True:
+        version = response_cache.version
+        feed = read_changes(db, since, limit, fields)
+        remaining = deadline - time.monotonic()
+        if feed["changes"] or since is None or remaining <= 0:
+            return feed
+        db.rollback()  # end the read transaction so the next poll sees new commits
+        response_cache.wait(version, min(remaining, CHANGES_POLL_INTERVAL))
 
 
 @app.get("/emails/{email_id}", response_model=EmailResponse)
-def get_email(email_id: int, db: Session = Depends(get_db)):
-    """Fetch a specific email by ID."""
+def get_email(email_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Fetch a specific email by ID; honours If-None-Match."""
     email = db.query(Email).filter(Email.id == email_id).first()
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
+    etag = email_etag(email)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return email
 
 
@@ -117,7 +1088,9 @@ def mark_email_as_read(email_id: int, db: Session = Depends(get_db)):
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     email.read = True
+    email.version += 1
     db.commit()
+    response_cache.invalidate()
     return {"id": email_id, "message": "Email marked as read"}
 
 
@@ -128,7 +1101,9 @@ def mark_email_as_unread(email_id: int, db: Session = Depends(get_db)):
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     email.read = False
+    email.version += 1
     db.commit()
+    response_cache.invalidate()
     return {"id": email_id, "message": "Email marked as unread"}
 
 
@@ -140,20 +1115,55 @@ def delete_email(email_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Email not found")
     db.delete(email)
     db.commit()
+    response_cache.invalidate()
     return {"id": email_id, "message": "Email deleted successfully"}
 
 
+@app.post("/emails/bulk/read", response_model=BulkActionResponse)
+def bulk_mark_as_read(action: BulkEmailAction, db: Session = Depends(get_db)):
+    """Mark every email matching the IDs and/or filter as read, in one transaction."""
+    ids = bulk_set_read(db, action, True)
+    if ids:
+        response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails marked as read"}
+
+
+@app.post("/emails/bulk/unread", response_model=BulkActionResponse)
+def bulk_mark_as_unread(action: BulkEmailAction, db: Session = Depends(get_db)):
+    """Mark every email matching the IDs and/or filter as unread, in one transaction."""
+    ids = bulk_set_read(db, action, False)
+    if ids:
+        response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails marked as unread"}
+
+
+@app.post("/emails/bulk/delete", response_model=BulkActionResponse)
+def bulk_delete_emails(action: BulkEmailAction, db: Session = Depends(get_db)):
+    """Delete every email matching the IDs and/or filter, in one transaction."""
+    ids = bulk_delete(db, action)
+    if ids:
+        response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails deleted"}
+
+
 @app.get("/reset_database", response_model=dict)
 def reset_database(db: Session = Depends(get_db)):
     """Reset emails to initial state (for testing)."""
-    # Delete all emails
-    db.query(Email).delete()
-    db.commit()
+    reset_emails(db)
+    response_cache.invalidate()
+    return {"message": "Database reset to initial state"}
 
-    # Re-seed with initial data
-    seed_database(db)
 
-    return {"message": "Database reset to initial state"}
+@app.get("/cache/stats", response_model=dict)
+def cache_stats():
+    """Hit/miss counters and size of the response cache."""
+    return response_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Request, SQL and serialization metrics in Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 # ================================
@@ -165,6 +1175,7 @@ def startup_event():
     """Initialize database with seed data on startup."""
     db = next(get_db())
     seed_database(db)
+    prune_change_log(db)
     db.close()
 
 
@@ -0,0 +1,361 @@
+# ================================
+# FastAPI Email Service Backend (async)
+# ================================
+"""
+Async variant of email_service.
+
+Same endpoints, payloads and query builders as email_service, but the
+handlers are `async def` on an AsyncSession (aiosqlite / asyncpg), so
+requests are served on the event loop instead of Starlette's threadpool.
+
+Run with:
+    uvicorn email_service_async:app --port 8000
+"""
+
+import time
+import asyncio
+
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Literal
+from datetime import datetime
+
+import metrics
+from models import Email, get_async_db, get_async_engine, prune_change_log
+from schemas import EmailCreate, EmailBatch, EmailResponse, BulkEmailAction, BulkActionResponse, ChangeFeed
+from email_service import (
+    NEWEST_FIRST, MAX_CHANGES_WAIT, CHANGES_POLL_INTERVAL, LIMIT_QUERY, CURSOR_QUERY, VIEW_QUERY, FIELDS_QUERY,
+    seed_database, reset_emails, ranked_search_query, page_query, finish_page, projected_fields, project,
+    list_query, unread_query, filter_query, like_search_query,
+    bulk_set_read, bulk_delete, ResponseCache, cache_key, render_page,
+    mailbox_etag, email_etag, etag_matches, not_modified, read_changes,
+    CHANGE_LOG_ENABLED, MAILBOX_VERSION_QUERY, local_mailbox_version,
+    FULL_FIELDS, export_query, export_chunks, export_response, email_rows, insert_emails,
+)
+
+app = FastAPI(title="Email Service API (async)", version="1.0.0")
+app.add_middleware(metrics.MetricsMiddleware)
+
+response_cache = ResponseCache()
+
+# How often a long-polling /emails/changes request checks for local writes
+CHANGES_WAKE_INTERVAL = 0.05
+
+
+# ================================
+# Helper Functions
+# ================================
+
+async def paginate(
+    db: AsyncSession,
+    statement,
+    keys: list,
+    limit: int,
+    cursor: Optional[str],
+    response: Response,
+    fields: Optional[list] = None
+):
+    """Async counterpart of email_service.paginate()."""
+    if fields is not None:
+        statement = project(statement, fields, keys)
+    rows = (await db.execute(page_query(statement, keys, limit, cursor))).all()
+    return finish_page(rows, keys, limit, response, fields)
+
+
+async def mailbox_version(db: AsyncSession) -> str:
+    """Async counterpart of email_service.mailbox_version()."""
+    if not CHANGE_LOG_ENABLED:
+        return local_mailbox_version(response_cache)
+    return str(await db.scalar(MAILBOX_VERSION_QUERY) or 0)
+
+
+async def cached_page(request: Request, response: Response, db: AsyncSession, build) -> Response:
+    """Async counterpart of email_service.cached_page(); `build` returns a paginate() coroutine."""
+    mailbox = await mailbox_version(db)
+    etag = mailbox_etag(mailbox)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    key = cache_key(request)
+    cached, version = response_cache.lookup(key, mailbox)
+    if cached is None:
+        cached = render_page(await build(), response)
+        response_cache.store(key, version, cached, mailbox)
+        cached.headers["X-Cache"] = "MISS"
+    cached.headers["ETag"] = etag
+    return cached
+
+
+async def _get_or_404(db: AsyncSession, email_id: int) -> Email:
+    email = await db.get(Email, email_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
+
+
+# ================================
+# Endpoints
+# ================================
+
+@app.post("/send", response_model=dict)
+async def send_email(email: EmailCreate, db: AsyncSession = Depends(get_async_db)):
+    """Send a new email."""
+    new_email = Email(
+        sender=email.sender,
+        recipient=email.recipient,
+        subject=email.subject,
+        body=email.body,
+        timestamp=datetime.utcnow(),
+        read=False
+    )
+    db.add(new_email)
+    await db.commit()
+    response_cache.invalidate()
+    return {"id": new_email.id, "message": "Email sent successfully"}
+
+
+@app.post("/send/batch", response_model=BulkActionResponse)
+async def send_email_batch(batch: EmailBatch, db: AsyncSession = Depends(get_async_db)):
+    """Send (or import) many emails in one transaction; returns their IDs in order."""
+    ids = await db.run_sync(insert_emails, email_rows(batch.model_dump()["emails"]))
+    await db.commit()
+    response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails sent"}
+
+
+@app.get("/emails", response_model=List[EmailResponse])
+async def list_emails(
+    request: Request,
+    response: Response,
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List all emails, newest first."""
+    fields = projected_fields(view, fields)
+    return await cached_page(request, response, db, lambda: paginate(
+        db, list_query(), NEWEST_FIRST, limit, cursor, response, fields
+    ))
+
+
+@app.get("/emails/unread", response_model=List[EmailResponse])
+async def list_unread_emails(
+    request: Request,
+    response: Response,
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List only unread emails."""
+    fields = projected_fields(view, fields)
+    return await cached_page(request, response, db, lambda: paginate(
+        db, unread_query(), NEWEST_FIRST, limit, cursor, response, fields
+    ))
+
+
+@app.get("/emails/search", response_model=List[EmailResponse])
+async def search_emails(
+    request: Request,
+    response: Response,
+    q: str = Query(..., description="Search query"),
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Search emails by keyword in subject, body, or sender."""
+    fields = projected_fields(view, fields)
+
+    async def search():
+        ranked = ranked_search_query(q)
+        if ranked:
+            try:
+                statement, keys = ranked
+                return await paginate(db, statement, keys, limit, cursor, response, fields)
+            except DBAPIError:
+                await db.rollback()
+        return await paginate(db, like_search_query(q), NEWEST_FIRST, limit, cursor, response, fields)
+
+    return await cached_page(request, response, db, search)
+
+
+@app.get("/emails/filter", response_model=List[EmailResponse])
+async def filter_emails(
+    request: Request,
+    response: Response,
+    recipient: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    sender: Optional[str] = Query(None, description="Sender address (case-insensitive)"),
+    read: Optional[bool] = Query(None, description="Only read (true) or unread (false) emails"),
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Filter emails by recipient, sender, read state and/or date range."""
+    fields = projected_fields(view, fields)
+    query = filter_query(recipient, start_date, end_date, sender, read)
+    return await cached_page(request, response, db, lambda: paginate(
+        db, query, NEWEST_FIRST, limit, cursor, response, fields
+    ))
+
+
+@app.get("/emails/export")
+async def export_emails(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[str] = FIELDS_QUERY,
+):
+    """Stream every email, oldest id first, as NDJSON or CSV."""
+    fields = projected_fields("full", fields) or FULL_FIELDS
+    header, encode = export_chunks(format, fields)
+
+    async def chunks():
+        if header:
+            yield header
+        async for db in get_async_db():
+            result = await db.stream(export_query(fields))
+            async for batch in result.partitions():
+                yield encode(batch)
+
+    return export_response(chunks(), format)
+
+
+@app.get("/emails/changes", response_model=ChangeFeed)
+async def list_changes(
+    since: Optional[int] = Query(None, ge=0, description="last_seq from the previous poll; omit to start at the current end"),
+    wait: float = Query(0, ge=0, le=MAX_CHANGES_WAIT, description="Seconds to hold the request open until a change arrives"),
+    limit: int = LIMIT_QUERY,
+    view: Literal["full", "summary"] = VIEW_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Inserts, updates and deletes after `since`, with optional long polling."""
+    fields = projected_fields(view, fields)
+    deadline = time.monotonic() + wait
+    while True:
+        version = response_cache.version
+        feed = await db.run_sync(read_changes, since, limit, fields)
+        remaining = deadline - time.monotonic()
+        if feed["changes"] or since is None or remaining <= 0:
+            return feed
+        await db.rollback()
+        # Local writes bump the cache version; other processes' writes are
+        # picked up by the next read, CHANGES_POLL_INTERVAL later at most
+        poll_at = time.monotonic() + min(remaining, CHANGES_POLL_INTERVAL)
+        while response_cache.version == version and time.monotonic() < poll_at:
+            await asyncio.sleep(CHANGES_WAKE_INTERVAL)
+
+
+@app.get("/emails/{email_id}", response_model=EmailResponse)
+async def get_email(email_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Fetch a specific email by ID; honours If-None-Match."""
+    email = await _get_or_404(db, email_id)
+    etag = email_etag(email)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return email
+
+
+@app.patch("/emails/{email_id}/read", response_model=dict)
+async def mark_email_as_read(email_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Mark an email as read."""
+    email = await _get_or_404(db, email_id)
+    email.read = True
+    email.version += 1
+    await db.commit()
+    response_cache.invalidate()
+    return {"id": email_id, "message": "Email marked as read"}
+
+
+@app.patch("/emails/{email_id}/unread", response_model=dict)
+async def mark_email_as_unread(email_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Mark an email as unread."""
+    email = await _get_or_404(db, email_id)
+    email.read = False
+    email.version += 1
+    await db.commit()
+    response_cache.invalidate()
+    return {"id": email_id, "message": "Email marked as unread"}
+
+
+@app.delete("/emails/{email_id}", response_model=dict)
+async def delete_email(email_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Delete an email by ID."""
+    email = await _get_or_404(db, email_id)
+    await db.delete(email)
+    await db.commit()
+    response_cache.invalidate()
+    return {"id": email_id, "message": "Email deleted successfully"}
+
+
+@app.post("/emails/bulk/read", response_model=BulkActionResponse)
+async def bulk_mark_as_read(action: BulkEmailAction, db: AsyncSession = Depends(get_async_db)):
+    """Mark every email matching the IDs and/or filter as read, in one transaction."""
+    ids = await db.run_sync(bulk_set_read, action, True)
+    if ids:
+        response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails marked as read"}
+
+
+@app.post("/emails/bulk/unread", response_model=BulkActionResponse)
+async def bulk_mark_as_unread(action: BulkEmailAction, db: AsyncSession = Depends(get_async_db)):
+    """Mark every email matching the IDs and/or filter as unread, in one transaction."""
+    ids = await db.run_sync(bulk_set_read, action, False)
+    if ids:
+        response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails marked as unread"}
+
+
+@app.post("/emails/bulk/delete", response_model=BulkActionResponse)
+async def bulk_delete_emails(action: BulkEmailAction, db: AsyncSession = Depends(get_async_db)):
+    """Delete every email matching the IDs and/or filter, in one transaction."""
+    ids = await db.run_sync(bulk_delete, action)
+    if ids:
+        response_cache.invalidate()
+    return {"ids": ids, "count": len(ids), "message": f"{len(ids)} emails deleted"}
+
+
+@app.get("/reset_database", response_model=dict)
+async def reset_database(db: AsyncSession = Depends(get_async_db)):
+    """Reset emails to initial state (for testing)."""
+    await db.run_sync(reset_emails)
+    response_cache.invalidate()
+    return {"message": "Database reset to initial state"}
+
+
+@app.get("/cache/stats", response_model=dict)
+async def cache_stats():
+    """Hit/miss counters and size of the response cache."""
+    return response_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Request, SQL and serialization metrics in Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ================================
+# Startup Event
+# ================================
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize database with seed data on startup."""
+    metrics.instrument_engine(get_async_engine().sync_engine)
+    async for db in get_async_db():
+        await db.run_sync(seed_database)
+        await db.run_sync(prune_change_log)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,60 +4,112 @@
 """
 These tools wrap the email service REST API endpoints,
 making them available for the LLM to call as functions.
+
+List tools return compact summaries (id, sender, subject, timestamp,
+read and a short body snippet) to keep the LLM context small; use
+get_email for the full body of a specific email.
 """
 
-import requests
+import service_client
 import json
 from typing import Optional, List
 
-BASE_URL = "http://localhost:8000"
+BASE_URL = service_client.BASE_URL
+PAGE_SIZE = 20
+
+
+# ================================
+# Pagination Helper
+# ================================
+
+def _get_page(path: str, params: dict, limit: int, cursor: Optional[str], view: str = "summary") -> dict:
+    """
+    Fetch one page from a list endpoint.
+
+    Returns:
+        {"emails": [...], "next_cursor": str or None}. Pass next_cursor
+        back to the same tool to get the following page.
+    """
+    params = dict(params, limit=limit, view=view)
+    if cursor:
+        params["cursor"] = cursor
+    response = service_client.get(path, params=params)
+    return {
+        "emails": response.json(),
+        "next_cursor": response.headers.get("X-Next-Cursor")
+    }
 
 
 # ================================
 # Tool Functions
 # ================================
 
-def list_all_emails() -> list:
-    """Fetch all emails from the inbox, ordered by newest first."""
-    response = requests.get(f"{BASE_URL}/emails")
-    return response.json()
+def list_all_emails(limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> dict:
+    """
+    Fetch emails from the inbox, ordered by newest first, one page at a time.
 
+    Args:
+        limit: Maximum number of emails to return.
+        cursor: The next_cursor value from a previous call, to get the next page.
 
-def list_unread_emails() -> list:
-    """Retrieve only unread emails from the inbox."""
-    response = requests.get(f"{BASE_URL}/emails/unread")
-    return response.json()
+    Returns:
+        A page of email summaries and the cursor for the next page (None if this is the last).
+    """
+    return _get_page("/emails", {}, limit, cursor)
+
+
+def list_unread_emails(limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> dict:
+    """
+    Retrieve unread emails from the inbox, one page at a time.
+
+    Args:
+        limit: Maximum number of emails to return.
+        cursor: The next_cursor value from a previous call, to get the next page.
+
+    Returns:
+        A page of unread email summaries and the cursor for the next page (None if this is the last).
+    """
+    return _get_page("/emails/unread", {}, limit, cursor)
 
 
-def search_emails(query: str) -> list:
+def search_emails(query: str, limit: int = PAGE_SIZE, cursor: Optional[str] = None) -> dict:
     """
     Search emails by keyword in subject, body, or sender.
 
     Args:
         query: The search term to look for in emails.
+        limit: Maximum number of emails to return.
+        cursor: The next_cursor value from a previous call, to get the next page.
 
     Returns:
-        List of matching emails.
+        A page of matching email summaries and the cursor for the next page (None if this is the last).
     """
-    response = requests.get(f"{BASE_URL}/emails/search", params={"q": query})
-    return response.json()
+    return _get_page("/emails/search", {"q": query}, limit, cursor)
 
 
 def filter_emails(
     recipient: Optional[str] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
-) -> list:
+    end_date: Optional[str] = None,
+    sender: Optional[str] = None,
+    read: Optional[bool] = None,
+    limit: int = PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> dict:
     """
-    Filter emails by recipient and/or date range.
+    Filter emails by recipient, sender, read state and/or date range.
 
     Args:
         recipient: Filter by recipient email address.
         start_date: Filter emails after this date (ISO format).
         end_date: Filter emails before this date (ISO format).
+        sender: Filter by sender email address.
+        read: True for only read emails, False for only unread emails.
+        limit: Maximum number of emails to return.
+        cursor: The next_cursor value from a previous call, to get the next page.
 
     Returns:
-        List of filtered emails.
+        A page of filtered email summaries and the cursor for the next page (None if this is the last).
     """
     params = {}
     if recipient:
@@ -66,23 +118,57 @@ def filter_emails(
         params["start_date"] = start_date
     if end_date:
         params["end_date"] = end_date
+    if sender:
+        params["sender"] = sender
+    if read is not None:
+        params["read"] = read
+
+    return _get_page("/emails/filter", params, limit, cursor)
+
 
-    response = requests.get(f"{BASE_URL}/emails/filter", params=params)
+def get_changes(since: Optional[int] = None, wait: float = 0, limit: int = PAGE_SIZE) -> dict:
+    """
+    Get what changed in the mailbox (new, updated and deleted emails) since a previous call.
+
+    Call once without `since` to get the current position, then pass the
+    returned last_seq back as `since` on every later call.
+
+    Args:
+        since: The last_seq value from a previous call; omit to start watching from now.
+        wait: Seconds to wait for a change to arrive if there is none yet (0 to 30).
+        limit: Maximum number of changes to return.
+
+    Returns:
+        {"changes": [...], "last_seq": int, "has_more": bool}. Each change has
+        seq, email_id, op ("insert", "update" or "delete"), changed_at and the
+        email's current summary (None for deleted emails).
+    """
+    params = {"wait": wait, "limit": limit, "view": "summary"}
+    if since is not None:
+        params["since"] = since
+    response = service_client.get(
+        "/emails/changes", params=params, timeout=service_client.TIMEOUT + wait
+    )
     return response.json()
 
 
-def get_email(email_id: int) -> dict:
+def get_email(email_id: int, body_offset: int = 0) -> dict:
     """
-    Fetch a specific email by its ID.
+    Fetch a specific email by its ID, including the full body.
 
     Args:
         email_id: The unique identifier of the email.
+        body_offset: Character position to start the body at, to read the rest of a long body that was cut.
 
     Returns:
         The email details as a dictionary.
     """
-    response = requests.get(f"{BASE_URL}/emails/{email_id}")
-    return response.json()
+    response = service_client.get(f"/emails/{email_id}")
+    email = response.json()
+    if body_offset and isinstance(email.get("body"), str):
+        email["body"] = email["body"][body_offset:]
+        email["body_offset"] = body_offset
+    return email
 
 
 def mark_email_as_read(email_id: int) -> dict:
@@ -95,7 +181,7 @@ def mark_email_as_read(email_id: int) -> dict:
     Returns:
         Confirmation message.
     """
-    response = requests.patch(f"{BASE_URL}/emails/{email_id}/read")
+    response = service_client.patch(f"/emails/{email_id}/read")
     return response.json()
 
 
@@ -109,7 +195,7 @@ def mark_email_as_unread(email_id: int) -> dict:
     Returns:
         Confirmation message.
     """
-    response = requests.patch(f"{BASE_URL}/emails/{email_id}/unread")
+    response = service_client.patch(f"/emails/{email_id}/unread")
     return response.json()
 
 
@@ -131,7 +217,7 @@ def send_email(recipient: str, subject: str, body: str) -> dict:
         "body": body,
         "sender": "you@email.com"
     }
-    response = requests.post(f"{BASE_URL}/send", json=payload)
+    response = service_client.post("/send", json=payload)
     return response.json()
 
 
@@ -145,22 +231,127 @@ def delete_email(email_id: int) -> dict:
     Returns:
         Confirmation message.
     """
-    response = requests.delete(f"{BASE_URL}/emails/{email_id}")
+    response = service_client.delete(f"/emails/{email_id}")
     return response.json()
 
 
-def search_unread_from_sender(sender_address: str) -> list:
+def search_unread_from_sender(
+    sender_address: str,
+    limit: int = PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> dict:
     """
     Return unread emails from a specific sender.
 
     Args:
         sender_address: The email address of the sender (e.g., boss@email.com).
+        limit: Maximum number of emails to return.
+        cursor: The next_cursor value from a previous call, to get the next page.
+
+    Returns:
+        A page of unread email summaries from the specified sender and the cursor for the next page.
+    """
+    params = {"sender": sender_address, "read": False}
+    return _get_page("/emails/filter", params, limit, cursor)
+
+
+# ================================
+# Bulk Tools
+# ================================
+
+def _bulk_action(
+    action: str,
+    email_ids: Optional[List[int]],
+    sender: Optional[str],
+    recipient: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    read: Optional[bool] = None
+) -> dict:
+    """POST a bulk action selecting emails by ID list and/or filter."""
+    criteria = {
+        "sender": sender,
+        "recipient": recipient,
+        "start_date": start_date,
+        "end_date": end_date,
+        "read": read,
+    }
+    criteria = {key: value for key, value in criteria.items() if value is not None}
+    payload = {}
+    if email_ids is not None:
+        payload["ids"] = email_ids
+    if criteria:
+        payload["filter"] = criteria
+    response = service_client.post(f"/emails/bulk/{action}", json=payload)
+    return response.json()
+
+
+def mark_emails_as_read(
+    email_ids: Optional[List[int]] = None,
+    sender: Optional[str] = None,
+    recipient: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> dict:
+    """
+    Mark many emails as read in one step, by ID list and/or by filter.
+
+    Args:
+        email_ids: IDs of the emails to mark as read.
+        sender: Mark emails from this sender address.
+        recipient: Mark emails sent to this recipient address.
+        start_date: Only emails after this date (ISO format).
+        end_date: Only emails before this date (ISO format).
+
+    Returns:
+        The IDs of the emails that were changed and their count.
+    """
+    return _bulk_action("read", email_ids, sender, recipient, start_date, end_date)
+
+
+def mark_emails_as_unread(
+    email_ids: Optional[List[int]] = None,
+    sender: Optional[str] = None,
+    recipient: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> dict:
+    """
+    Mark many emails as unread in one step, by ID list and/or by filter.
+
+    Args:
+        email_ids: IDs of the emails to mark as unread.
+        sender: Mark emails from this sender address.
+        recipient: Mark emails sent to this recipient address.
+        start_date: Only emails after this date (ISO format).
+        end_date: Only emails before this date (ISO format).
 
     Returns:
-        List of unread emails from the specified sender.
+        The IDs of the emails that were changed and their count.
     """
-    # Get all unread emails
-    unread = requests.get(f"{BASE_URL}/emails/unread").json()
+    return _bulk_action("unread", email_ids, sender, recipient, start_date, end_date)
 
-    # Filter by sender
-    return [email for email in unread if email.get("sender", "").lower() == sender_address.lower()]
+
+def delete_emails(
+    email_ids: Optional[List[int]] = None,
+    sender: Optional[str] = None,
+    recipient: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    read: Optional[bool] = None
+) -> dict:
+    """
+    Delete many emails in one step, by ID list and/or by filter.
+
+    Args:
+        email_ids: IDs of the emails to delete.
+        sender: Delete emails from this sender address.
+        recipient: Delete emails sent to this recipient address.
+        start_date: Only emails after this date (ISO format).
+        end_date: Only emails before this date (ISO format).
+        read: True to delete only read emails, False for only unread.
+
+    Returns:
+        The IDs of the deleted emails and their count.
+    """
+    return _bulk_action("delete", email_ids, sender, recipient, start_date, end_date, read)
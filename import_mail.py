@@ -0,0 +1,146 @@
+# ================================
+# Mailbox Importer
+# ================================
+"""
+Load a historical mailbox straight into the email database.
+
+Reads an mbox file or a JSONL file (one object per line with sender,
+recipient, subject, body and optionally timestamp and read), and inserts
+it with multi-row Core INSERTs, committing every --commit-every rows.
+The FTS index and change log are kept current by their triggers.
+Progress and the final rate are reported in rows/sec.
+
+    python import_mail.py archive.mbox
+    python import_mail.py export.jsonl --batch-size 1000 --commit-every 20000
+
+Writes to DATABASE_URL, like the service. A running service sees the new
+mail on its next request: the change log triggers record every row, and
+list pages, their ETags and the response cache follow the change log.
+"""
+
+import argparse
+import json
+import mailbox
+import sys
+import time
+from datetime import datetime
+from email.header import decode_header, make_header
+from email.utils import parsedate_to_datetime
+from itertools import islice
+
+from models import SessionLocal
+from email_service import INSERT_BATCH_SIZE, email_rows, insert_emails, naive_utc
+
+
+# ================================
+# Readers
+# ================================
+
+def _header(message, name: str) -> str:
+    value = message.get(name)
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except (UnicodeError, LookupError, ValueError):
+        return str(value)
+
+
+def _body(message) -> str:
+    """The first text/plain part of a message, decoded."""
+    parts = message.walk() if message.is_multipart() else [message]
+    for part in parts:
+        if part.get_content_type() == "text/plain" and not part.get_filename():
+            payload = part.get_payload(decode=True) or b""
+            return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    return ""
+
+
+def _timestamp(message):
+    """The Date header as naive UTC (how the service stores timestamps), or None."""
+    try:
+        date = parsedate_to_datetime(message["Date"])
+    except (TypeError, ValueError):
+        return None
+    return naive_utc(date)
+
+
+def read_mbox(path: str):
+    """Yield one email dict per message in an mbox file."""
+    for message in mailbox.mbox(path, create=False):
+        yield {
+            "sender": _header(message, "From"),
+            "recipient": _header(message, "To"),
+            "subject": _header(message, "Subject"),
+            "body": _body(message),
+            "timestamp": _timestamp(message),
+            "read": "R" in message.get_flags(),
+        }
+
+
+def read_jsonl(path: str):
+    """Yield one email dict per non-blank line of a JSONL file."""
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            if line.strip():
+                email = json.loads(line)
+                if isinstance(email.get("timestamp"), str):
+                    email["timestamp"] = datetime.fromisoformat(email["timestamp"])
+                yield email
+
+
+READERS = {"mbox": read_mbox, "jsonl": read_jsonl}
+
+
+# ================================
+# Loader
+# ================================
+
+def load(emails, batch_size: int = INSERT_BATCH_SIZE, commit_every: int = 10000, progress=None) -> dict:
+    """
+    Insert an iterable of email dicts, committing every `commit_every` rows.
+
+    Args:
+        emails: Email dicts (see email_service.email_rows()).
+        batch_size: Rows per INSERT statement.
+        commit_every: Rows per transaction.
+        progress: Optional callback(rows_so_far, seconds_so_far), called after each commit.
+
+    Returns:
+        {"rows": ..., "seconds": ..., "rows_per_sec": ...}
+    """
+    emails = iter(emails)
+    rows = 0
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        while True:
+            chunk = list(islice(emails, commit_every))
+            if not chunk:
+                break
+            rows += len(insert_emails(db, email_rows(chunk), batch_size))
+            db.commit()
+            if progress:
+                progress(rows, time.perf_counter() - started)
+    seconds = time.perf_counter() - started
+    return {"rows": rows, "seconds": round(seconds, 3), "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=list(READERS), help="Defaults to the file extension (.mbox or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=INSERT_BATCH_SIZE)
+    parser.add_argument("--commit-every", type=int, default=10000)
+    args = parser.parse_args()
+
+    format = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "mbox")
+
+    def progress(rows, seconds):
+        print(f"{rows} rows, {rows / seconds:.0f} rows/sec", file=sys.stderr)
+
+    result = load(READERS[format](args.path), args.batch_size, args.commit_every, progress)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
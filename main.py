@@ -2,28 +2,49 @@
 # Email Assistant Agent - Main
 # ================================
 
-# --- Third-party ---
-from dotenv import load_dotenv
-import aisuite as ai
-import json
+# Importing this module is cheap: dotenv, aisuite (and its provider SDKs)
+# and the tool modules are only loaded when first used, so code that only
+# needs build_prompt() or the email tools does not pay for them.
+# benchmarks.import_time keeps it that way.
 
-# --- Local / project ---
-import utils
-import display_functions
-import email_tools
+import threading
+from pathlib import Path
 
 
 # ================================
 # Environment & Client
 # ================================
-import os
-from pathlib import Path
 
-# Load environment variables from .env
-env_path = Path(__file__).parent / '.env'
-load_dotenv(env_path)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the shared AISuite client, creating it on first use.
+
+    Loads environment variables from .env and imports aisuite at that
+    point; aisuite in turn only imports a provider's SDK when a model
+    from that provider is first requested.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from dotenv import load_dotenv
+                import aisuite as ai
 
-client = ai.Client()   # Initialize AISuite client
+                # Load environment variables from .env
+                load_dotenv(Path(__file__).parent / '.env')
+                _client = ai.Client()   # Initialize AISuite client
+    return _client
+
+
+def __getattr__(name):
+    # `main.client` still works, but only builds the client when accessed
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ================================
@@ -56,6 +77,8 @@ def build_prompt(request_: str) -> str:
 # ================================
 
 if __name__ == "__main__":
+    import utils
+
     # Example: Print the formatted prompt
     example_prompt = build_prompt("Delete the Happy Hour email")
     utils.print_html(content=example_prompt, title="Example Prompt")
@@ -64,6 +87,9 @@ if __name__ == "__main__":
     # Test the email tools (uncomment to try)
     # ================================
 
+    # import json
+    # import email_tools
+
     # Test sending a new email and fetch it by ID
     # new_email = email_tools.send_email("test@example.com", "Lunch plans", "Shall we meet at noon?")
     # content_ = email_tools.get_email(new_email['id'])
@@ -76,6 +102,7 @@ if __name__ == "__main__":
     # content_ = email_tools.mark_email_as_read(new_email['id'])
     # content_ = email_tools.mark_email_as_unread(new_email['id'])
     # content_ = email_tools.search_unread_from_sender("test@example.com")
+    # content_ = email_tools.get_changes(since=0)
     # content_ = email_tools.delete_email(new_email['id'])
 
     # utils.print_html(content=json.dumps(content_, indent=2), title="Testing the email_tools")
@@ -84,10 +111,13 @@ if __name__ == "__main__":
     # LLM + Email Tools Examples
     # ================================
 
+    # import email_tools
+    # import display_functions
+
     # Example 1: Check unread emails from boss and send follow-up
     # prompt_ = build_prompt("Check for unread emails from boss@email.com, mark them as read, and send a polite follow-up.")
     #
-    # response = client.chat.completions.create(
+    # response = get_client().chat.completions.create(
     #     model="anthropic:claude-sonnet-4-20250514",
     #     messages=[{"role": "user", "content": prompt_}],
     #     tools=[
@@ -96,6 +126,7 @@ if __name__ == "__main__":
     #         email_tools.search_emails,
     #         email_tools.get_email,
     #         email_tools.mark_email_as_read,
+    #         email_tools.mark_emails_as_read,
     #         email_tools.send_email
     #     ],
     #     max_turns=5,
@@ -105,7 +136,7 @@ if __name__ == "__main__":
     # Example 2: Delete Happy Hour email (with delete_email tool)
     # prompt_ = build_prompt("Delete the happy hour email")
     #
-    # response = client.chat.completions.create(
+    # response = get_client().chat.completions.create(
     #     model="anthropic:claude-sonnet-4-20250514",
     #     messages=[{"role": "user", "content": prompt_}],
     #     tools=[
@@ -121,6 +152,43 @@ if __name__ == "__main__":
     # )
     # display_functions.pretty_print_chat_completion(response)
 
+    # Example 3: Trace a run (per-tool latency, payload size, tokens, LLM turns),
+    # answering repeated reads from a run-scoped cache and compacting results
+    # from tracer import Tracer
+    # from tool_cache import ToolCache
+    # from compaction import Compactor
+    # tracer = Tracer()
+    # tracer.cache = ToolCache()
+    # tracer.compaction = Compactor()
+    # tools_ = tracer.wrap_all(tracer.compaction.wrap_all(tracer.cache.wrap_all([
+    #     email_tools.list_unread_emails,
+    #     email_tools.search_emails,
+    #     email_tools.get_email,
+    #     email_tools.mark_email_as_read
+    # ])))
+    # with tracer.run():
+    #     response = get_client().chat.completions.create(
+    #         model="anthropic:claude-sonnet-4-20250514",
+    #         messages=[{"role": "user", "content": build_prompt("Summarize my unread emails")}],
+    #         tools=tools_,
+    #         max_turns=5
+    #     )
+    # tracer.print_summary()
+    # tracer.save("trace.json")
+
+    # Example 4: Run the same turn's tool calls concurrently (see agent.py)
+    # from agent import run_agent
+    # from tracer import Tracer
+    # tracer = Tracer()
+    # with tracer.run():
+    #     result = run_agent(
+    #         build_prompt("Open my three latest unread emails and mark them as read"),
+    #         model="anthropic:claude-sonnet-4-20250514",
+    #         tracer=tracer
+    #     )
+    # utils.print_html(content=result["content"], title="Agent answer")
+    # tracer.print_summary()
+
     print("\n[INFO] Email Assistant Agent ready.")
     print("[INFO] Start the email service first: python email_service.py")
     print("[INFO] Then uncomment examples above to test the agent.\n")
@@ -0,0 +1,243 @@
+# ================================
+# Service Metrics
+# ================================
+"""
+In-process metrics for the email service, exposed in Prometheus text format.
+
+No client library or collector is needed: counters, gauges and histograms
+live in this module and /metrics renders them. What is recorded:
+
+    http_requests_total              requests by method, route template and status
+    http_request_duration_seconds    latency histogram by method and route
+    http_requests_in_flight          requests currently being served
+    db_queries_total                 SQL statements executed, by route
+    db_query_duration_seconds        SQL execution time histogram, by route
+    serialization_duration_seconds   time spent encoding list pages, by route
+
+Routes are labelled with their template ("/emails/{email_id}"), never the
+raw path, so label cardinality stays bounded. Set METRICS_ENABLED=false to
+turn recording off.
+"""
+
+import os
+import time
+import threading
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+# ASGI scope of the request being served. The router records the matched
+# route in this same dict, so SQL and serialization timings recorded while
+# the handler runs can be labelled with the route template.
+current_scope = ContextVar("current_scope", default=None)
+
+
+def route_template(scope) -> str:
+    """The matched route's template for an ASGI scope ("<none>" outside a request)."""
+    if scope is None:
+        return "<none>"
+    return getattr(scope.get("route"), "path", "<unmatched>")
+
+
+# ================================
+# Metric Types
+# ================================
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class: a named family of series keyed by label values."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labelvalues, value in series:
+            lines += self._render_series(labelvalues, value)
+        return lines
+
+    def _render_series(self, labelvalues: tuple, value) -> list:
+        return [f"{self.name}{_labels(self.labelnames, labelvalues)} {value}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = REQUEST_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # per-bucket (non-cumulative) counts, the +Inf overflow, then sum
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _render_series(self, labelvalues: tuple, series: list) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+        labels = _labels(self.labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {series[-1]}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Every metric in Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ================================
+# Service Metrics
+# ================================
+
+REQUESTS = Counter("http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, including the body.", ("method", "route")
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+QUERIES = Counter("db_queries_total", "SQL statements executed.", ("route",))
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time.", ("route",), buckets=FAST_BUCKETS
+)
+SERIALIZATION_DURATION = Histogram(
+    "serialization_duration_seconds", "Time spent encoding response bodies.", ("route",), buckets=FAST_BUCKETS
+)
+
+
+@contextmanager
+def time_serialization():
+    """Record the time spent in the block as serialization of the current route's response."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if METRICS_ENABLED:
+            SERIALIZATION_DURATION.observe(time.perf_counter() - started, route_template(current_scope.get()))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency and in-flight requests.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass
+    through untouched and the per-request overhead stays small.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            template = route_template(scope)
+            REQUESTS.inc(scope["method"], template, str(status))
+            REQUEST_DURATION.observe(elapsed, scope["method"], template)
+            current_scope.reset(token)
+
+
+_instrumented = weakref.WeakSet()
+
+
+def instrument_engine(bind) -> None:
+    """
+    Count and time every SQL statement `bind` executes.
+
+    Args:
+        bind: A sync Engine (for an AsyncEngine pass its .sync_engine).
+    """
+    if not METRICS_ENABLED or bind in _instrumented:
+        return
+    _instrumented.add(bind)
+
+    # One start time per connection, replaced by each statement, so a
+    # statement that raises (and never reaches _after) leaves nothing behind
+    @event.listens_for(bind, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(bind, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_started")
+        route = route_template(current_scope.get())
+        QUERIES.inc(route)
+        QUERY_DURATION.observe(elapsed, route)
@@ -2,8 +2,8 @@
 # Pydantic Schemas
 # ================================
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List
 from datetime import datetime
 
 
@@ -14,6 +14,16 @@ class EmailCreate(BaseModel):
     sender: Optional[str] = "you@email.com"
 
 
+class EmailImport(EmailCreate):
+    """An email for /send/batch; historical mail can carry its own timestamp and read state."""
+    timestamp: Optional[datetime] = None
+    read: bool = False
+
+
+class EmailBatch(BaseModel):
+    emails: List[EmailImport] = Field(..., min_length=1, max_length=10000)
+
+
 class EmailResponse(BaseModel):
     id: int
     sender: str
@@ -31,3 +41,32 @@ class EmailFilter(BaseModel):
     recipient: Optional[str] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    sender: Optional[str] = None
+    read: Optional[bool] = None
+
+
+class BulkEmailAction(BaseModel):
+    """Selects emails for a bulk action: explicit IDs, a filter, or both (ANDed)."""
+    ids: Optional[List[int]] = None
+    filter: Optional[EmailFilter] = None
+
+
+class BulkActionResponse(BaseModel):
+    ids: List[int]
+    count: int
+    message: str
+
+
+class EmailChangeEvent(BaseModel):
+    seq: int
+    email_id: int
+    op: str  # "insert", "update" or "delete"
+    changed_at: datetime
+    # Current state of the email (full or projected); None once it is deleted
+    email: Optional[dict] = None
+
+
+class ChangeFeed(BaseModel):
+    changes: List[EmailChangeEvent]
+    last_seq: int  # pass back as ?since= for the next poll
+    has_more: bool
@@ -0,0 +1,320 @@
+# ================================
+# Email Service Client
+# ================================
+"""
+Shared client for talking to the email service.
+
+All tool and helper calls go through one pooled, keep-alive session
+instead of opening a new connection per request. With the "inprocess"
+transport, requests are handed straight to email_service.app through
+its ASGI interface instead, with no server or socket involved; payloads
+are identical to HTTP mode, but there is no timeout and response bodies
+are not streamed (see stream_lines()). Configuration is read from the environment:
+
+    EMAIL_SERVICE_TRANSPORT  "http" (default) or "inprocess"
+    EMAIL_SERVICE_URL        Base URL of the service (default http://localhost:8000)
+    EMAIL_SERVICE_POOL_SIZE  Max pooled connections to the service (default 10)
+    EMAIL_SERVICE_TIMEOUT    Per-request timeout in seconds for "http" (default 10)
+    EMAIL_SERVICE_RETRIES    Retries for failed idempotent requests (default 3)
+    EMAIL_SERVICE_BACKOFF    Backoff factor between retries in seconds (default 0.3)
+    EMAIL_SERVICE_CONDITIONAL_CACHE
+                             GET responses kept for revalidation (default 128, 0 disables)
+"""
+
+import os
+import time
+import codecs
+import atexit
+import threading
+from collections import OrderedDict
+
+TRANSPORTS = ("http", "inprocess")
+
+TRANSPORT = os.getenv("EMAIL_SERVICE_TRANSPORT", "http").lower()
+BASE_URL = os.getenv("EMAIL_SERVICE_URL", "http://localhost:8000").rstrip("/")
+POOL_SIZE = int(os.getenv("EMAIL_SERVICE_POOL_SIZE", "10"))
+TIMEOUT = float(os.getenv("EMAIL_SERVICE_TIMEOUT", "10"))
+RETRIES = int(os.getenv("EMAIL_SERVICE_RETRIES", "3"))
+BACKOFF = float(os.getenv("EMAIL_SERVICE_BACKOFF", "0.3"))
+CONDITIONAL_CACHE_SIZE = int(os.getenv("EMAIL_SERVICE_CONDITIONAL_CACHE", "128"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    """Create a requests.Session with a sized connection pool and retry policy."""
+    # Imported here so importing the tool modules stays cheap
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(502, 503, 504),
+        # POST (send) is not idempotent and is never retried
+        allowed_methods=frozenset({"GET", "PATCH", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _build_inprocess_client():
+    """
+    Create a client that calls email_service.app directly over ASGI.
+
+    The client is entered so the app's startup handlers (seeding) run
+    exactly as they would under uvicorn.
+    """
+    from fastapi.testclient import TestClient
+    from email_service import app
+
+    client = TestClient(app, base_url=BASE_URL, raise_server_exceptions=False)
+    client.__enter__()
+    return client
+
+
+def get_session():
+    """
+    Return the process-wide client, creating it on first use.
+
+    This is a requests.Session for the "http" transport and a
+    requests-compatible ASGI test client for "inprocess".
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                if TRANSPORT == "inprocess":
+                    _session = _build_inprocess_client()
+                else:
+                    _session = _build_session()
+    return _session
+
+
+def close() -> None:
+    """Close the shared client and drop its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            if TRANSPORT == "inprocess":
+                _session.__exit__(None, None, None)
+            else:
+                _session.close()
+            _session = None
+        conditional_cache.clear()
+
+
+def set_transport(transport: str) -> None:
+    """
+    Switch between the "http" and "inprocess" transports at runtime.
+
+    Args:
+        transport: One of TRANSPORTS.
+    """
+    global TRANSPORT
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport {transport!r}, expected one of {TRANSPORTS}")
+    close()
+    TRANSPORT = transport
+
+
+if TRANSPORT not in TRANSPORTS:
+    raise ValueError(f"EMAIL_SERVICE_TRANSPORT must be one of {TRANSPORTS}, got {TRANSPORT!r}")
+
+atexit.register(close)
+
+
+# ================================
+# Conditional GET Cache
+# ================================
+# GET responses that carry an ETag are kept (LRU) and revalidated with
+# If-None-Match on the next identical GET. On a 304 the stored response is
+# returned as-is, so callers never see the difference except in bandwidth.
+
+class ConditionalCache:
+    """Thread-safe LRU of the last ETag-bearing response per GET request."""
+
+    def __init__(self, max_entries: int = CONDITIONAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.revalidated = 0
+        self.refetched = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path: str, params) -> tuple:
+        items = params.items() if isinstance(params, dict) else (params or ())
+        return path, tuple(sorted((str(k), str(v)) for k, v in items if v is not None))
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, key, response) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "revalidated": self.revalidated, "refetched": self.refetched}
+
+
+conditional_cache = ConditionalCache()
+
+
+# ================================
+# Request Hooks
+# ================================
+# Observers called after every request with
+# (method, path, seconds, status_code, bytes received), e.g. tracer.Tracer.
+
+_request_hooks = []
+
+
+def add_request_hook(hook) -> None:
+    _request_hooks.append(hook)
+
+
+def remove_request_hook(hook) -> None:
+    if hook in _request_hooks:
+        _request_hooks.remove(hook)
+
+
+def _send(method: str, path: str, **kwargs):
+    started = time.perf_counter()
+    response = get_session().request(method, f"{BASE_URL}{path}", **kwargs)
+    if _request_hooks:
+        elapsed = time.perf_counter() - started
+        for hook in list(_request_hooks):
+            hook(method, path, elapsed, response.status_code, len(response.content))
+    return response
+
+
+# ================================
+# Request Helpers
+# ================================
+
+def _with_timeout(kwargs: dict) -> dict:
+    """Apply the default timeout; the in-process client has none, so drop it there."""
+    if TRANSPORT == "inprocess":
+        kwargs.pop("timeout", None)
+    else:
+        kwargs.setdefault("timeout", TIMEOUT)
+    return kwargs
+
+
+def request(method: str, path: str, **kwargs):
+    """
+    Send a request to the email service.
+
+    GETs are revalidated against conditional_cache: a 304 answer returns
+    the previously stored response.
+
+    Args:
+        method: HTTP method.
+        path: Path relative to BASE_URL, e.g. "/emails".
+        **kwargs: Passed through to the client (params, json, ...). A
+            `timeout` (default TIMEOUT) only applies to the "http" transport.
+
+    Returns:
+        The response (requests.Response or the equivalent httpx.Response).
+    """
+    _with_timeout(kwargs)
+    if method.upper() != "GET" or conditional_cache.max_entries <= 0:
+        return _send(method, path, **kwargs)
+
+    key = ConditionalCache.key(path, kwargs.get("params"))
+    cached = conditional_cache.get(key)
+    if cached is not None:
+        kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"If-None-Match": cached.headers["ETag"]})
+    response = _send(method, path, **kwargs)
+    if response.status_code == 304 and cached is not None:
+        conditional_cache.revalidated += 1
+        return cached
+    if response.status_code == 200 and "ETag" in response.headers:
+        if cached is not None:
+            conditional_cache.refetched += 1
+        conditional_cache.put(key, response)
+    return response
+
+
+def get(path: str, **kwargs):
+    return request("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs):
+    return request("POST", path, **kwargs)
+
+
+def patch(path: str, **kwargs):
+    return request("PATCH", path, **kwargs)
+
+
+def delete(path: str, **kwargs):
+    return request("DELETE", path, **kwargs)
+
+
+def stream_lines(path: str, keepends: bool = False, **kwargs):
+    """
+    GET `path` and yield the response body line by line as it arrives.
+
+    Lines are split on "\n" only and decoded as UTF-8, so a line
+    containing other line-break characters stays whole.
+
+    Only the "http" transport streams. The in-process test client runs
+    the app to completion and buffers the whole body before the first
+    line is yielded, so in-process export timings and memory use are not
+    those of a streamed response.
+
+    Args:
+        path: Path relative to BASE_URL, e.g. "/emails/export".
+        keepends: Keep each line's "\n" or "\r\n" ending (needed to parse
+            CSV fields that span lines).
+        **kwargs: Passed through to the client (params, ...).
+
+    Yields:
+        Decoded lines. Raises for error statuses.
+    """
+    _with_timeout(kwargs)
+    url = f"{BASE_URL}{path}"
+    session = get_session()
+    if TRANSPORT == "inprocess":
+        with session.stream("GET", url, **kwargs) as response:
+            response.raise_for_status()
+            yield from _split_lines(response.iter_bytes(), keepends)
+    else:
+        with session.get(url, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            yield from _split_lines(response.iter_content(chunk_size=65536), keepends)
+
+
+def _split_lines(chunks, keepends: bool):
+    """Turn a stream of byte chunks into decoded lines."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n" if keepends else line.removesuffix("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending if keepends else pending.removesuffix("\r")
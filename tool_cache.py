@@ -0,0 +1,204 @@
+# ================================
+# Run-Scoped Tool Cache
+# ================================
+"""
+Memoize the read-only email tools for the length of one agent run.
+
+Models often repeat a call (list_unread_emails, search_emails, get_email)
+with the same arguments within a run. Wrapping the tools with a ToolCache
+answers the repeats from memory instead of another round trip to the
+email service:
+
+    cache = ToolCache()
+    tools = cache.wrap_all([email_tools.list_unread_emails, email_tools.get_email, email_tools.mark_email_as_read])
+
+Mutating tools are wrapped too, so the cache can drop what they may have
+changed. Every mutation drops all list and search entries; get_email
+entries are dropped as follows:
+
+    mark_email_as_read/unread, delete_email   that email
+    mark_emails_as_read/unread, delete_emails the IDs the service reports
+                                              as changed (all if unknown)
+    send_email                                none
+
+A read that was in flight while an invalidation happened is returned but
+not stored, so concurrent calls (see agent.run_agent) never cache a stale
+result. Error responses are never cached.
+
+Use one ToolCache per run; stats() (hits, misses, invalidations and the
+tool time saved) is included in Tracer.trace() when the tracer is given
+the cache.
+"""
+
+import copy
+import time
+import inspect
+import functools
+import threading
+from typing import Callable, List
+
+# Read-only tools whose results are memoized
+CACHEABLE_TOOLS = {
+    "list_all_emails",
+    "list_unread_emails",
+    "search_emails",
+    "filter_emails",
+    "search_unread_from_sender",
+    "get_email",
+}
+
+# Mutating tools, by what they invalidate
+SINGLE_EMAIL_MUTATIONS = {"mark_email_as_read", "mark_email_as_unread", "delete_email"}
+BULK_MUTATIONS = {"mark_emails_as_read", "mark_emails_as_unread", "delete_emails"}
+NEW_EMAIL_MUTATIONS = {"send_email"}
+
+
+class ToolCache:
+    """Memoized results of the read-only tools for one agent run."""
+
+    def __init__(self):
+        self._entries = {}
+        # Bumped by every invalidation; a read is only stored if no
+        # invalidation happened while it was in flight
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.invalidations = 0
+
+    # ---- wrapping ----
+
+    def wrap(self, tool: Callable) -> Callable:
+        """Return `tool` wrapped with the cache; name, signature and docstring are kept."""
+        name = tool.__name__
+        if name in CACHEABLE_TOOLS:
+            wrapper = self._cached(tool)
+        elif name in SINGLE_EMAIL_MUTATIONS | BULK_MUTATIONS | NEW_EMAIL_MUTATIONS:
+            wrapper = self._invalidating(tool)
+        else:
+            return tool
+        wrapper.__tool_cache__ = self
+        return wrapper
+
+    def wrap_all(self, tools: List[Callable]) -> List[Callable]:
+        return [self.wrap(tool) for tool in tools]
+
+    def _cached(self, tool: Callable) -> Callable:
+        name = tool.__name__
+        signature = inspect.signature(tool)
+
+        @functools.wraps(tool)
+        def cached(*args, **kwargs):
+            # get_email(3), get_email(email_id=3) and get_email("3") share an entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if "email_id" in bound.arguments:
+                bound.arguments["email_id"] = _email_id(bound.arguments["email_id"])
+            key = (name, tuple(sorted(bound.arguments.items())))
+            with self._lock:
+                entry = self._entries.get(key)
+                row = self._row(name)
+                if entry is not None:
+                    row["hits"] += 1
+                    row["saved_ms"] += entry[1]
+                    return copy.deepcopy(entry[0])
+                row["misses"] += 1
+                epoch = self._epoch
+
+            started = time.perf_counter()
+            result = tool(*args, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if not _is_error(result):
+                with self._lock:
+                    if self._epoch == epoch:
+                        self._entries[key] = (copy.deepcopy(result), elapsed_ms)
+            return result
+
+        return cached
+
+    def _invalidating(self, tool: Callable) -> Callable:
+        name = tool.__name__
+        signature = inspect.signature(tool)
+
+        @functools.wraps(tool)
+        def invalidating(*args, **kwargs):
+            try:
+                arguments = signature.bind(*args, **kwargs).arguments
+            except TypeError:
+                # Bad arguments: the call raises before anything is applied
+                return tool(*args, **kwargs)
+            result = None
+            try:
+                result = tool(*args, **kwargs)
+                return result
+            finally:
+                # Invalidate even if the call failed; it may have been applied
+                self._invalidate(name, arguments, result)
+
+        return invalidating
+
+    # ---- invalidation ----
+
+    def _invalidate(self, name: str, arguments: dict, result) -> None:
+        if name in SINGLE_EMAIL_MUTATIONS:
+            email_ids = [_email_id(arguments["email_id"])]
+        elif name in BULK_MUTATIONS:
+            ids = result.get("ids") if isinstance(result, dict) else None
+            email_ids = [_email_id(email_id) for email_id in ids] if isinstance(ids, list) else None
+        else:
+            email_ids = []
+
+        with self._lock:
+            self.invalidations += 1
+            self._epoch += 1
+            if email_ids is None:
+                # Unknown which emails changed
+                dropped = list(self._entries)
+            else:
+                dropped = [
+                    key for key in self._entries
+                    if key[0] != "get_email" or dict(key[1])["email_id"] in email_ids
+                ]
+            for key in dropped:
+                del self._entries[key]
+                self._row(key[0])["invalidated"] += 1
+
+    def clear(self) -> None:
+        """Drop every entry (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    # ---- statistics ----
+
+    def _row(self, name: str) -> dict:
+        return self._stats.setdefault(name, {"hits": 0, "misses": 0, "invalidated": 0, "saved_ms": 0.0})
+
+    def stats(self) -> dict:
+        """Hits, misses, dropped entries and tool time saved, in total and per tool."""
+        with self._lock:
+            tools = {name: dict(row, saved_ms=round(row["saved_ms"], 3)) for name, row in self._stats.items()}
+            entries = len(self._entries)
+        hits = sum(row["hits"] for row in tools.values())
+        lookups = hits + sum(row["misses"] for row in tools.values())
+        return {
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "saved_ms": round(sum(row["saved_ms"] for row in tools.values()), 3),
+            "invalidations": self.invalidations,
+            "entries": entries,
+            "tools": tools,
+        }
+
+
+def _email_id(value):
+    """An email ID as the service reads it, so "3" and 3 name the same email."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _is_error(result) -> bool:
+    """Service error bodies ({"detail": ...}) and agent error results."""
+    return isinstance(result, dict) and ("detail" in result or "error" in result)
@@ -0,0 +1,364 @@
+# ================================
+# Agent Run Tracer
+# ================================
+"""
+Per-tool timing, payload size and token accounting for agent runs.
+
+Wrap the tools before handing them to the LLM client; the wrappers keep
+each tool's name, signature and docstring, so the tool schemas the model
+sees are unchanged:
+
+    tracer = Tracer()
+    tools = tracer.wrap_all([email_tools.list_unread_emails, email_tools.get_email])
+    with tracer.run():
+        response = client.chat.completions.create(model=..., messages=..., tools=tools, max_turns=5)
+    tracer.print_summary()
+    tracer.save("trace.json")
+
+For every tool call the trace records wall time, time spent in HTTP
+requests to the email service, bytes received from the service, and the
+size and estimated token count of the result the tool returned
+(result_tokens). When the loop changes results before the model reads
+them, as agent.run_agent() does by compacting them, it reports what it
+actually sent with record_sent(); per-tool and total sent_tokens are
+those figures, or result_tokens for tools with nothing recorded.
+
+When the client runs the tool loop itself (aisuite's max_turns), LLM time
+is not visible directly: calls separated by less than TURN_GAP seconds
+are grouped into one turn, and the gaps before, between and after turns
+are attributed to the model. Loops that call the model themselves can
+record exact turns with llm_turn(); agent.run_agent() does.
+
+Set `tracer.cache` to a tool_cache.ToolCache, or `tracer.compaction` to
+a compaction.Compactor, to include their statistics in the trace.
+"""
+
+import json
+import time
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import service_client
+
+# Tool calls closer together than this (seconds) belong to the same turn
+TURN_GAP = 0.05
+
+
+# ================================
+# Token Estimation
+# ================================
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens `text` adds to the model's context.
+
+    Uses tiktoken's cl100k_base encoding when tiktoken is installed,
+    otherwise roughly 4 characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+# ================================
+# Tracer
+# ================================
+
+class Tracer:
+    """Collects tool calls and LLM turns for one or more agent runs."""
+
+    def __init__(self, turn_gap: float = TURN_GAP):
+        self.turn_gap = turn_gap
+        self.calls = []
+        self.llm_turns = []
+        self.started = None
+        self.finished = None
+        self.cache = None
+        self.compaction = None
+        self.sent_tokens = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ---- wrapping ----
+
+    def wrap(self, tool: Callable) -> Callable:
+        """Return `tool` wrapped so every call is recorded; name, signature and docstring are kept."""
+        if getattr(tool, "__tracer__", None) is self:
+            return tool
+
+        @functools.wraps(tool)
+        def traced(*args, **kwargs):
+            call = {
+                "tool": tool.__name__,
+                "args": _arguments(tool, args, kwargs),
+                "start": self._clock(),
+                "http_ms": 0.0,
+                "http_requests": 0,
+                "response_bytes": 0,
+            }
+            self._local.call = call
+            started = time.perf_counter()
+            try:
+                result = tool(*args, **kwargs)
+            except Exception as exc:
+                call["error"] = f"{type(exc).__name__}: {exc}"
+                raise
+            finally:
+                call["wall_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                call["end"] = self._clock()
+                call["http_ms"] = round(call["http_ms"], 3)
+                self._local.call = None
+                with self._lock:
+                    self.calls.append(call)
+            content = json.dumps(result, default=str)
+            call["result_bytes"] = len(content.encode("utf-8"))
+            call["result_tokens"] = estimate_tokens(content)
+            return result
+
+        traced.__tracer__ = self
+        return traced
+
+    def wrap_all(self, tools: List[Callable]) -> List[Callable]:
+        return [self.wrap(tool) for tool in tools]
+
+    def record_sent(self, tool: str, content: str) -> None:
+        """Count the tokens of `content`, a result of `tool` as it was sent to the model."""
+        tokens = estimate_tokens(content)
+        with self._lock:
+            self.sent_tokens[tool] = self.sent_tokens.get(tool, 0) + tokens
+
+    def _on_request(self, method: str, path: str, seconds: float, status: int, size: int) -> None:
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call["http_ms"] += seconds * 1000
+            call["http_requests"] += 1
+            call["response_bytes"] += size
+
+    # ---- run boundaries ----
+
+    def _clock(self) -> float:
+        if self.started is None:
+            self.started = time.perf_counter()
+        return round(time.perf_counter() - self.started, 6)
+
+    def start(self) -> None:
+        """Start the run clock and begin capturing service requests."""
+        self.started = time.perf_counter()
+        self.finished = None
+        service_client.add_request_hook(self._on_request)
+
+    def stop(self) -> None:
+        self.finished = self._clock()
+        service_client.remove_request_hook(self._on_request)
+
+    @contextmanager
+    def run(self):
+        """Context manager around one agent run (start() ... stop())."""
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    @contextmanager
+    def llm_turn(self, usage: Optional[dict] = None):
+        """
+        Record the block as one exact LLM turn.
+
+        Args:
+            usage: Optional token usage reported by the provider; may be
+                filled in by the block before it exits.
+        """
+        turn = {"start": self._clock(), "usage": usage if usage is not None else {}}
+        try:
+            yield turn
+        finally:
+            turn["end"] = self._clock()
+            turn["llm_ms"] = round((turn["end"] - turn["start"]) * 1000, 3)
+            with self._lock:
+                self.llm_turns.append(turn)
+
+    # ---- reporting ----
+
+    def turns(self) -> list:
+        """
+        LLM turns of the run, each with the tool calls it issued.
+
+        tool_ms is the sum of the calls' wall times; tool_wall_ms is the
+        time the turn actually spent in tools, which is shorter when the
+        calls ran concurrently (see agent.run_agent).
+
+        Exact turns from llm_turn() are used when there are any; otherwise
+        turns are inferred from the gaps between tool calls.
+        """
+        with self._lock:
+            calls = sorted(self.calls, key=lambda call: call["start"])
+            recorded = list(self.llm_turns)
+        if recorded:
+            turns = []
+            for index, turn in enumerate(recorded):
+                next_start = recorded[index + 1]["start"] if index + 1 < len(recorded) else float("inf")
+                issued = [call for call in calls if turn["end"] <= call["start"] < next_start]
+                turns.append(dict(turn, turn=index + 1, tool_calls=[call["tool"] for call in issued],
+                                  tool_ms=round(sum(call["wall_ms"] for call in issued), 3),
+                                  tool_wall_ms=_span_ms(issued)))
+            return turns
+
+        # Calls of one turn may run concurrently, so a group ends when its
+        # slowest call does, not when the last one to start does
+        groups = []
+        group_end = None
+        for call in calls:
+            if groups and call["start"] - group_end < self.turn_gap:
+                groups[-1].append(call)
+                group_end = max(group_end, call["end"])
+            else:
+                groups.append([call])
+                group_end = call["end"]
+        turns = []
+        previous_end = 0.0
+        for index, group in enumerate(groups):
+            turns.append({
+                "turn": index + 1,
+                "llm_ms": round((group[0]["start"] - previous_end) * 1000, 3),
+                "tool_calls": [call["tool"] for call in group],
+                "tool_ms": round(sum(call["wall_ms"] for call in group), 3),
+                "tool_wall_ms": _span_ms(group),
+                "inferred": True,
+            })
+            previous_end = max(call["end"] for call in group)
+        if self.finished is not None:
+            turns.append({
+                "turn": len(groups) + 1,
+                "llm_ms": round((self.finished - previous_end) * 1000, 3),
+                "tool_calls": [],
+                "tool_ms": 0.0,
+                "tool_wall_ms": 0.0,
+                "inferred": True,
+            })
+        return turns
+
+    def summary(self) -> dict:
+        """Per-tool totals: calls, wall and HTTP time, bytes, and tokens returned and sent."""
+        tools = {}
+        with self._lock:
+            calls = list(self.calls)
+            sent_tokens = dict(self.sent_tokens)
+        for call in calls:
+            row = tools.setdefault(call["tool"], {
+                "calls": 0, "errors": 0, "wall_ms": 0.0, "http_ms": 0.0,
+                "http_requests": 0, "response_bytes": 0, "result_tokens": 0,
+            })
+            row["calls"] += 1
+            row["errors"] += "error" in call
+            row["wall_ms"] += call["wall_ms"]
+            row["http_ms"] += call["http_ms"]
+            row["http_requests"] += call["http_requests"]
+            row["response_bytes"] += call["response_bytes"]
+            row["result_tokens"] += call.get("result_tokens", 0)
+        for name, row in tools.items():
+            row["sent_tokens"] = sent_tokens.get(name, row["result_tokens"])
+            row["wall_ms"] = round(row["wall_ms"], 3)
+            row["http_ms"] = round(row["http_ms"], 3)
+            row["avg_ms"] = round(row["wall_ms"] / row["calls"], 3)
+        return dict(sorted(tools.items(), key=lambda item: -item[1]["wall_ms"]))
+
+    def trace(self) -> dict:
+        """The whole trace as a JSON-serializable dict."""
+        turns = self.turns()
+        tools = self.summary()
+        with self._lock:
+            calls = sorted(self.calls, key=lambda call: call["start"])
+        return {
+            "totals": {
+                "run_ms": round(self.finished * 1000, 3) if self.finished is not None else None,
+                "llm_ms": round(sum(turn["llm_ms"] for turn in turns), 3),
+                "tool_ms": round(sum(call["wall_ms"] for call in calls), 3),
+                "tool_wall_ms": round(sum(turn["tool_wall_ms"] for turn in turns), 3),
+                "http_ms": round(sum(call["http_ms"] for call in calls), 3),
+                "tool_calls": len(calls),
+                "turns": len(turns),
+                "response_bytes": sum(call["response_bytes"] for call in calls),
+                "result_tokens": sum(call.get("result_tokens", 0) for call in calls),
+                "sent_tokens": sum(row["sent_tokens"] for row in tools.values()),
+            },
+            "tools": tools,
+            "turns": turns,
+            "calls": calls,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "compaction": self.compaction.stats() if self.compaction is not None else None,
+        }
+
+    def save(self, path: str) -> None:
+        """Write trace() to `path` as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.trace(), f, indent=2, default=str)
+
+    def summary_table(self) -> str:
+        """Per-tool summary as a fixed-width text table."""
+        trace = self.trace()
+        lines = [
+            f"  {'Tool':<28} {'Calls':>5} {'Wall ms':>9} {'Avg ms':>8} {'HTTP ms':>9} {'Bytes':>8} {'Tokens':>7} {'Sent':>7}",
+            "-" * 88,
+        ]
+        for name, row in trace["tools"].items():
+            lines.append(
+                f"  {name[:28]:<28} {row['calls']:>5} {row['wall_ms']:>9.1f} {row['avg_ms']:>8.1f} "
+                f"{row['http_ms']:>9.1f} {row['response_bytes']:>8} {row['result_tokens']:>7} {row['sent_tokens']:>7}"
+            )
+        totals = trace["totals"]
+        lines.append("-" * 88)
+        lines.append(
+            f"  {'TOTAL':<28} {totals['tool_calls']:>5} {totals['tool_ms']:>9.1f} {'':>8} "
+            f"{totals['http_ms']:>9.1f} {totals['response_bytes']:>8} {totals['result_tokens']:>7} {totals['sent_tokens']:>7}"
+        )
+        lines.append(f"  LLM time: {totals['llm_ms']:.1f} ms over {totals['turns']} turns")
+        lines.append(f"  Tool time: {totals['tool_wall_ms']:.1f} ms wall, {totals['tool_ms']:.1f} ms summed over calls")
+        cache = trace["cache"]
+        if cache is not None:
+            lines.append(
+                f"  Tool cache: {cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['invalidations']} invalidations, {cache['saved_ms']:.1f} ms saved"
+            )
+        compaction = trace["compaction"]
+        if compaction is not None:
+            lines.append(
+                f"  Compaction: {compaction['tokens_before']} -> {compaction['tokens_after']} tokens "
+                f"({compaction['tokens_saved']} saved) over {compaction['results']} results"
+            )
+        return "\n".join(lines)
+
+    def print_summary(self) -> None:
+        print("\n" + "=" * 80)
+        print("  AGENT RUN TRACE")
+        print("=" * 80)
+        print(self.summary_table())
+        print("=" * 80 + "\n")
+
+
+def _span_ms(calls: list) -> float:
+    """Wall time from the first call's start to the last call's end; less than the sum when calls overlap."""
+    if not calls:
+        return 0.0
+    return round((max(call["end"] for call in calls) - min(call["start"] for call in calls)) * 1000, 3)
+
+
+def _arguments(tool: Callable, args: tuple, kwargs: dict) -> dict:
+    """The call's arguments by parameter name."""
+    try:
+        return dict(inspect.signature(tool).bind_partial(*args, **kwargs).arguments)
+    except TypeError:
+        return {"args": list(args), **kwargs}
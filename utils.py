@@ -2,12 +2,13 @@
 # Utility Functions & Test Helpers
 # ================================
 
-import requests
+import service_client
+import csv
 import json
 from typing import Optional
 from datetime import datetime
 
-BASE_URL = "http://localhost:8000"
+BASE_URL = service_client.BASE_URL
 
 
 # ================================
@@ -39,7 +40,7 @@ def test_send_email(
         "body": body,
         "sender": "you@email.com"
     }
-    response = requests.post(f"{BASE_URL}/send", json=payload)
+    response = service_client.post("/send", json=payload)
     result = response.json()
     print_html(json.dumps(result, indent=2), "Send Email Result")
     return result
@@ -47,7 +48,7 @@ def test_send_email(
 
 def test_get_email(email_id: int) -> dict:
     """Fetch a specific email by ID."""
-    response = requests.get(f"{BASE_URL}/emails/{email_id}")
+    response = service_client.get(f"/emails/{email_id}")
     result = response.json()
     print_html(json.dumps(result, indent=2, default=str), f"Email ID: {email_id}")
     return result
@@ -55,7 +56,7 @@ def test_get_email(email_id: int) -> dict:
 
 def test_list_emails() -> list:
     """List all emails."""
-    response = requests.get(f"{BASE_URL}/emails")
+    response = service_client.get("/emails")
     result = response.json()
     print_html(json.dumps(result, indent=2, default=str), "All Emails")
     return result
@@ -63,7 +64,7 @@ def test_list_emails() -> list:
 
 def test_unread_emails() -> list:
     """List unread emails."""
-    response = requests.get(f"{BASE_URL}/emails/unread")
+    response = service_client.get("/emails/unread")
     result = response.json()
     print_html(json.dumps(result, indent=2, default=str), "Unread Emails")
     return result
@@ -71,7 +72,7 @@ def test_unread_emails() -> list:
 
 def test_search_emails(query: str) -> list:
     """Search emails by keyword."""
-    response = requests.get(f"{BASE_URL}/emails/search", params={"q": query})
+    response = service_client.get("/emails/search", params={"q": query})
     result = response.json()
     print_html(json.dumps(result, indent=2, default=str), f"Search Results: '{query}'")
     return result
@@ -91,7 +92,7 @@ def test_filter_emails(
     if end_date:
         params["end_date"] = end_date
 
-    response = requests.get(f"{BASE_URL}/emails/filter", params=params)
+    response = service_client.get("/emails/filter", params=params)
     result = response.json()
     print_html(json.dumps(result, indent=2, default=str), "Filtered Emails")
     return result
@@ -99,7 +100,7 @@ def test_filter_emails(
 
 def test_mark_read(email_id: int) -> dict:
     """Mark an email as read."""
-    response = requests.patch(f"{BASE_URL}/emails/{email_id}/read")
+    response = service_client.patch(f"/emails/{email_id}/read")
     result = response.json()
     print_html(json.dumps(result, indent=2), f"Mark Read: Email {email_id}")
     return result
@@ -107,7 +108,7 @@ def test_mark_read(email_id: int) -> dict:
 
 def test_mark_unread(email_id: int) -> dict:
     """Mark an email as unread."""
-    response = requests.patch(f"{BASE_URL}/emails/{email_id}/unread")
+    response = service_client.patch(f"/emails/{email_id}/unread")
     result = response.json()
     print_html(json.dumps(result, indent=2), f"Mark Unread: Email {email_id}")
     return result
@@ -115,15 +116,182 @@ def test_mark_unread(email_id: int) -> dict:
 
 def test_delete_email(email_id: int) -> dict:
     """Delete an email by ID."""
-    response = requests.delete(f"{BASE_URL}/emails/{email_id}")
+    response = service_client.delete(f"/emails/{email_id}")
     result = response.json()
     print_html(json.dumps(result, indent=2), f"Delete Email: {email_id}")
     return result
 
 
+def test_import_timestamp(timestamp: str = "2020-01-01T12:00:00+05:00", expected: str = "2020-01-01T07:00:00") -> dict:
+    """Import one email with an offset timestamp through /send/batch and check it is stored as UTC."""
+    payload = {"emails": [{
+        "recipient": "test@example.com", "subject": "Imported", "body": "Imported email.", "timestamp": timestamp,
+    }]}
+    email_id = service_client.post("/send/batch", json=payload).json()["ids"][0]
+    result = service_client.get(f"/emails/{email_id}").json()
+    print_html(json.dumps(result, indent=2), f"Imported Email: {email_id}")
+    assert result["timestamp"] == expected, f"stored {result['timestamp']}, expected {expected}"
+    return result
+
+
 def reset_database() -> dict:
     """Reset the email database to initial state."""
-    response = requests.get(f"{BASE_URL}/reset_database")
+    response = service_client.get("/reset_database")
     result = response.json()
     print_html(json.dumps(result, indent=2), "Database Reset")
     return result
+
+
+# ================================
+# Export
+# ================================
+
+def iter_export(format: str = "ndjson", fields: Optional[list] = None):
+    """
+    Stream the whole mailbox from /emails/export, one email at a time.
+
+    Rows are parsed as they arrive, so memory use does not grow with the
+    size of the mailbox.
+
+    Args:
+        format: "ndjson" (typed values) or "csv" (all values as strings).
+        fields: Optional subset of fields to export.
+
+    Yields:
+        One dict per email, in id order.
+    """
+    params = {"format": format}
+    if fields:
+        params["fields"] = ",".join(fields)
+    if format == "csv":
+        # Line endings are kept: quoted bodies may span several lines
+        yield from csv.DictReader(service_client.stream_lines("/emails/export", keepends=True, params=params))
+    else:
+        for line in service_client.stream_lines("/emails/export", params=params):
+            if line:
+                yield json.loads(line)
+
+
+def test_export(format: str = "ndjson") -> int:
+    """Stream the full export and print how many emails it contained."""
+    count = sum(1 for _ in iter_export(format))
+    print_html(f"{count} emails exported as {format}", "Export")
+    return count
+
+
+# ================================
+# Query Plan Check
+# ================================
+
+def test_query_plans() -> dict:
+    """
+    Check that every list endpoint's query is served by an index.
+
+    Runs EXPLAIN QUERY PLAN for each query shape (first page and cursor
+    page) against the local database and raises AssertionError if any
+    of them falls back to a full table scan or a full sort.
+    """
+    from models import SessionLocal, explain_query_plan, full_scans
+    import email_service as svc
+
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        shapes = {
+            "list": svc.list_query(),
+            "unread": svc.unread_query(),
+            "filter recipient": svc.filter_query(recipient="you@email.com"),
+            "filter dates": svc.filter_query(start_date=now, end_date=now),
+            "filter recipient + dates": svc.filter_query("you@email.com", now, now),
+            "filter sender + read": svc.filter_query(sender="boss@email.com", read=False),
+        }
+        plans = {}
+        for name, query in shapes.items():
+            for cursor in (None, svc.encode_cursor([now, 1])):
+                label = f"{name} (cursor)" if cursor else name
+                paged = svc.page_query(query, svc.NEWEST_FIRST, svc.DEFAULT_PAGE_SIZE, cursor)
+                plans[label] = explain_query_plan(db, paged)
+    finally:
+        db.close()
+
+    print_html(json.dumps(plans, indent=2), "Query Plans")
+    failures = {label: full_scans(plan) for label, plan in plans.items() if full_scans(plan)}
+    assert not failures, f"Queries without a usable index: {failures}"
+    return plans
+
+
+# ================================
+# PostgreSQL Search Check
+# ================================
+
+def test_postgres_search(queries: Optional[list] = None) -> dict:
+    """
+    Check the PostgreSQL full-text search path.
+
+    Compiles the tsvector/GIN index DDL, the change log triggers, the
+    to_tsquery() strings from build_tsquery() and every ranked search
+    statement (first page and cursor page) for the PostgreSQL dialect,
+    and checks that each statement repeats the indexed expression. When
+    DATABASE_URL points at PostgreSQL the DDL and statements are also
+    run there, and each search is EXPLAINed (with sequential scans off)
+    to confirm it uses ix_emails_search.
+
+    Args:
+        queries: Search strings to check (default: a prefix, a phrase,
+            quotes and backslashes, and a query with no searchable terms).
+
+    Returns:
+        {query: {"tsquery": ..., "sql": ..., "rows": ..., "plan": ...}};
+        rows and plan are only present when run against PostgreSQL.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.dialects import postgresql
+    from models import SessionLocal, engine, pg_search_document, _pg_search_ddl, PG_CHANGE_DDL, init_search_index, init_change_log
+    import email_service as svc
+
+    queries = queries or ["rev", '"q3 report" rev', "o'brien back\\slash", "!!"]
+    dialect = postgresql.dialect()
+    document = str(pg_search_document().compile(dialect=dialect))
+    ddl = _pg_search_ddl()
+    assert document in ddl, "search index DDL does not index pg_search_document()"
+    assert not any("OR REPLACE TRIGGER" in statement for statement in PG_CHANGE_DDL), "trigger DDL needs PostgreSQL 14"
+
+    now = datetime.utcnow()
+    results = {}
+    for q in queries:
+        tsquery = svc.build_tsquery(q)
+        result = results[q] = {"tsquery": tsquery}
+        if tsquery is None:
+            continue
+        statement, keys = svc.pg_search_query(tsquery)
+        result["sql"] = {}
+        for cursor in (None, svc.encode_cursor([0.5, now, 1])):
+            paged = svc.page_query(statement, keys, svc.DEFAULT_PAGE_SIZE, cursor)
+            sql = str(paged.compile(dialect=dialect))
+            assert document in sql, f"search for {q!r} does not repeat the indexed expression"
+            result["sql"]["cursor" if cursor else "first"] = sql
+
+    if engine.dialect.name == "postgresql":
+        # Re-running the DDL must be a no-op on an existing database
+        init_search_index(engine)
+        init_change_log(engine)
+        db = SessionLocal()
+        try:
+            for q, result in results.items():
+                if result["tsquery"] is None:
+                    continue
+                statement, keys = svc.pg_search_query(result["tsquery"])
+                paged = svc.page_query(statement, keys, svc.DEFAULT_PAGE_SIZE, None)
+                result["rows"] = len(db.execute(paged).all())
+                # A handful of rows is always cheaper to scan; make the planner show the index path
+                db.execute(text("SET LOCAL enable_seqscan = off"))
+                sql = paged.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+                plan = db.execute(text(f"EXPLAIN {sql}")).scalars().all()
+                result["plan"] = plan
+                assert any("ix_emails_search" in line for line in plan), f"search for {q!r} does not use ix_emails_search"
+            db.rollback()
+        finally:
+            db.close()
+
+    print_html(json.dumps(results, indent=2), "PostgreSQL Search")
+    return results